@@ -0,0 +1,182 @@
+import threading
+from dataclasses import dataclass
+from typing import BinaryIO, List
+from sqlalchemy.orm import Session
+
+from .config import CATEGORY_DISTANCE_THRESHOLD
+from .db import models
+from .utils import get_file_path
+
+# Pillow and NumPy are optional: without them images are placed by
+# extension only, as before.
+
+CATEGORY_PREFIX = "group_"
+
+HASH_BITS = 64
+HIST_BINS = 64  # 4 levels per RGB channel
+
+# Share of the distance given to the difference hash (structure); the
+# rest goes to the colour histogram.
+HASH_WEIGHT = 0.5
+
+
+@dataclass
+class ImageFeatures:
+    dhash: bytes        # packed 64-bit difference hash
+    histogram: bytes    # HIST_BINS float32, sums to 1
+
+
+def compute_features(fp: BinaryIO) -> ImageFeatures | None:
+    """
+    Decodes an image at reduced scale and returns its difference hash
+    and coarse colour histogram, or None if it cannot be read.
+    Leaves the file positioned at the start.
+    """
+    try:
+        import numpy as np
+        from PIL import Image
+    except ImportError:
+        return None
+
+    fp.seek(0)
+    try:
+        with Image.open(fp) as img:
+            img.draft("RGB", (64, 64))
+            rgb = img.convert("RGB").resize((64, 64))
+    except Exception:
+        return None
+    finally:
+        fp.seek(0)
+
+    grey = np.asarray(rgb.convert("L").resize((9, 8)), dtype=np.int16)
+    bits = grey[:, 1:] > grey[:, :-1]
+
+    levels = np.asarray(rgb, dtype=np.uint8) >> 6
+    bins = (levels[..., 0].astype(np.int32) << 4) | (levels[..., 1] << 2) | levels[..., 2]
+    hist = np.bincount(bins.ravel(), minlength=HIST_BINS).astype(np.float32)
+    hist /= hist.sum()
+
+    return ImageFeatures(np.packbits(bits).tobytes(), hist.tobytes())
+
+
+class FeatureIndex:
+    """
+    In-memory matrix of every stored image's features, loaded from the
+    image_features table on first use and then kept current by appending
+    new rows (ours, and any written by other workers since the last
+    lookup). Nearest-neighbour search is one vectorized pass.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded_id = 0
+        self._count = 0
+        self._bits = None       # (capacity, HASH_BITS) bool
+        self._hist = None       # (capacity, HIST_BINS) float32
+        self._alive = None      # (capacity,) bool
+        self._categories: List[str] = []
+        self._objects: List[str] = []
+
+    def place(self, db: Session, features: ImageFeatures, filename: str) -> str:
+        """
+        Picks the category of the nearest stored image (or a new one),
+        records the features and returns the object path to upload to.
+        """
+        import numpy as np
+
+        with self._lock:
+            self._refresh(db)
+
+            bits = np.unpackbits(np.frombuffer(features.dhash, dtype=np.uint8)).astype(bool)
+            hist = np.frombuffer(features.histogram, dtype=np.float32)
+
+            category = None
+            if self._count:
+                n = self._count
+                hamming = (self._bits[:n] != bits).sum(axis=1) / HASH_BITS
+                colour = np.abs(self._hist[:n] - hist).sum(axis=1) / 2
+                distance = HASH_WEIGHT * hamming + (1 - HASH_WEIGHT) * colour
+                distance[~self._alive[:n]] = np.inf
+                nearest = int(distance.argmin())
+                if distance[nearest] <= CATEGORY_DISTANCE_THRESHOLD:
+                    category = self._categories[nearest]
+
+            if category is None:
+                category = self._new_category()
+
+            object_path = get_file_path(filename, subfolder=category)
+            row = models.ImageFeature(
+                object_name=object_path,
+                category=category,
+                dhash=features.dhash,
+                histogram=features.histogram
+            )
+            db.add(row)
+            db.commit()
+            db.refresh(row)
+            self._append(row.id, object_path, category, bits, hist)
+            return object_path
+
+    def forget(self, db: Session, object_name: str):
+        """
+        Drops the features of an object that was deleted or never stored.
+        """
+        db.query(models.ImageFeature).filter(
+            models.ImageFeature.object_name == object_name
+        ).delete()
+        db.commit()
+        with self._lock:
+            for i, name in enumerate(self._objects):
+                if name == object_name:
+                    self._alive[i] = False
+
+    def _refresh(self, db: Session):
+        import numpy as np
+
+        rows = (
+            db.query(models.ImageFeature)
+            .filter(models.ImageFeature.id > self._loaded_id)
+            .order_by(models.ImageFeature.id)
+            .all()
+        )
+        for row in rows:
+            bits = np.unpackbits(np.frombuffer(row.dhash, dtype=np.uint8)).astype(bool)
+            hist = np.frombuffer(row.histogram, dtype=np.float32)
+            self._append(row.id, row.object_name, row.category, bits, hist)
+
+    def _append(self, row_id, object_name, category, bits, hist):
+        import numpy as np
+
+        if row_id <= self._loaded_id:
+            return
+
+        if self._bits is None or self._count == len(self._bits):
+            capacity = max(256, self._count * 2)
+            new_bits = np.zeros((capacity, HASH_BITS), dtype=bool)
+            new_hist = np.zeros((capacity, HIST_BINS), dtype=np.float32)
+            new_alive = np.zeros(capacity, dtype=bool)
+            if self._bits is not None:
+                new_bits[:self._count] = self._bits[:self._count]
+                new_hist[:self._count] = self._hist[:self._count]
+                new_alive[:self._count] = self._alive[:self._count]
+            self._bits, self._hist, self._alive = new_bits, new_hist, new_alive
+
+        i = self._count
+        self._bits[i] = bits
+        self._hist[i] = hist
+        self._alive[i] = True
+        self._categories.append(category)
+        self._objects.append(object_name)
+        self._count += 1
+        self._loaded_id = row_id
+
+    def _new_category(self) -> str:
+        numbers = [
+            int(c[len(CATEGORY_PREFIX):])
+            for c in set(self._categories)
+            if c.startswith(CATEGORY_PREFIX) and c[len(CATEGORY_PREFIX):].isdigit()
+        ]
+        return f"{CATEGORY_PREFIX}{max(numbers, default=0) + 1}"
+
+
+feature_index = FeatureIndex()
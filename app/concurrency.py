@@ -0,0 +1,40 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from .config import STORAGE_WORKERS, DB_WORKERS, THUMBNAIL_WORKERS
+
+storage_pool = ThreadPoolExecutor(max_workers=STORAGE_WORKERS, thread_name_prefix="storage")
+db_pool = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="db")
+# Background jobs that requests never wait on (thumbnails).
+media_pool = ThreadPoolExecutor(max_workers=THUMBNAIL_WORKERS, thread_name_prefix="media")
+
+
+async def run_in_pool(pool: ThreadPoolExecutor, func: Callable, *args, **kwargs) -> Any:
+    # Run in a copy of the caller's context so request-scoped state (the
+    # profiling span collector) follows the call into the pool thread.
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(pool, ctx.run, functools.partial(func, *args, **kwargs))
+
+
+async def run_storage(func: Callable, *args, **kwargs) -> Any:
+    """
+    Runs a blocking MinIO call on the storage pool.
+    """
+    return await run_in_pool(storage_pool, func, *args, **kwargs)
+
+
+async def run_db(func: Callable, *args, **kwargs) -> Any:
+    """
+    Runs a blocking SQLAlchemy / pymongo call on the DB pool.
+    """
+    return await run_in_pool(db_pool, func, *args, **kwargs)
+
+
+def shutdown_pools():
+    storage_pool.shutdown(wait=True)
+    db_pool.shutdown(wait=True)
+    media_pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,88 @@
+import os
+
+# Bounded worker pools for blocking calls made from async endpoints.
+# Storage (MinIO) transfers are network-bound and tolerate more threads;
+# SQLite serializes writers, so the DB pool is kept small.
+STORAGE_WORKERS = int(os.getenv("STORAGE_WORKERS", "16"))
+DB_WORKERS = int(os.getenv("DB_WORKERS", "4"))
+
+# MongoDB (NoSQL JSON datasets). One client is shared for the app's lifetime.
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+MONGO_DB = os.getenv("MONGO_DB", "json_ingestion")
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+
+# Rows per executemany() batch when bulk-loading SQL datasets.
+SQL_INSERT_BATCH_SIZE = int(os.getenv("SQL_INSERT_BATCH_SIZE", "5000"))
+
+# Streaming JSON ingestion: bytes read per chunk, elements used to pick
+# SQL vs NoSQL, and documents per insert_many() batch.
+JSON_STREAM_CHUNK_SIZE = int(os.getenv("JSON_STREAM_CHUNK_SIZE", str(1024 * 1024)))
+# Largest single array element / NDJSON value the stream reader buffers.
+MAX_JSON_ELEMENT_SIZE = int(os.getenv("MAX_JSON_ELEMENT_SIZE", str(16 * 1024 * 1024)))
+CLASSIFY_SAMPLE_SIZE = int(os.getenv("CLASSIFY_SAMPLE_SIZE", "1000"))
+NOSQL_INSERT_BATCH_SIZE = int(os.getenv("NOSQL_INSERT_BATCH_SIZE", "1000"))
+
+# Content-addressed deduplication: identical uploads share one MinIO
+# object, which is removed when its last file row is deleted.
+DEDUP_UPLOADS = os.getenv("DEDUP_UPLOADS", "1") == "1"
+
+# /upload/batch: files per request and concurrent MinIO writes per request
+# (all requests together are still capped by STORAGE_WORKERS).
+MAX_BATCH_FILES = int(os.getenv("MAX_BATCH_FILES", "100"))
+BATCH_UPLOAD_CONCURRENCY = int(os.getenv("BATCH_UPLOAD_CONCURRENCY", "8"))
+
+# Presigned GET URLs are valid for PRESIGNED_URL_EXPIRY_SECONDS and reused
+# from an in-process LRU until PRESIGNED_URL_REFRESH_MARGIN seconds before
+# they expire.
+PRESIGNED_URL_EXPIRY_SECONDS = int(os.getenv("PRESIGNED_URL_EXPIRY_SECONDS", "600"))
+PRESIGNED_URL_REFRESH_MARGIN = int(os.getenv("PRESIGNED_URL_REFRESH_MARGIN", "60"))
+PRESIGNED_URL_CACHE_SIZE = int(os.getenv("PRESIGNED_URL_CACHE_SIZE", "10000"))
+
+# Direct-to-MinIO uploads: how long a reserved path / presigned PUT is valid.
+PRESIGNED_UPLOAD_EXPIRY_SECONDS = int(os.getenv("PRESIGNED_UPLOAD_EXPIRY_SECONDS", "3600"))
+
+# Background thumbnail / poster-frame generation for media uploads.
+THUMBNAIL_WORKERS = int(os.getenv("THUMBNAIL_WORKERS", "2"))
+THUMBNAIL_SIZE = int(os.getenv("THUMBNAIL_SIZE", "320"))
+
+# Image categorization: an upload joins the category of its nearest
+# stored image if their feature distance (0..1) is below this threshold,
+# otherwise it starts a new category folder.
+CATEGORY_DISTANCE_THRESHOLD = float(os.getenv("CATEGORY_DISTANCE_THRESHOLD", "0.2"))
+
+# Background JSON ingestion jobs: worker processes, and how many jobs may
+# be queued or running at once before new ones are refused.
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+MAX_PENDING_INGEST_JOBS = int(os.getenv("MAX_PENDING_INGEST_JOBS", "32"))
+# Finished jobs kept for status polling.
+INGEST_JOB_HISTORY = int(os.getenv("INGEST_JOB_HISTORY", "1000"))
+
+# MinIO object storage. The client is created on first use.
+MINIO_ENDPOINT = os.getenv("MINIO_ENDPOINT", "localhost:9000")
+MINIO_ACCESS_KEY = os.getenv("MINIO_ACCESS_KEY", "minioadmin")
+MINIO_SECRET_KEY = os.getenv("MINIO_SECRET_KEY", "minioadmin")
+MINIO_SECURE = os.getenv("MINIO_SECURE", "0") == "1"
+MINIO_BUCKET = os.getenv("MINIO_BUCKET", "files")
+
+# Cold start (import + lifespan startup) above this many seconds is logged.
+STARTUP_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", "2.0"))
+
+# Request profiling: with PROFILE_REQUESTS=1, clients may send
+# "X-Profile: 1" to get a per-span Server-Timing breakdown. Off by
+# default, since it exposes internal DB/storage/cache timings to anyone.
+# A fraction of all requests can be sampled too. Profiled requests
+# slower than SLOW_REQUEST_SECONDS are logged.
+PROFILE_REQUESTS = os.getenv("PROFILE_REQUESTS", "0") == "1"
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "1.0"))
+
+# Rows per record batch when exporting datasets to Parquet / Arrow.
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "50000"))
+
+# Read-through cache of serialized /json/{id} pages. Entries larger than
+# the per-entry limit are not cached; bodies above 1 KiB are stored
+# zlib-compressed when RESULT_CACHE_COMPRESS is on.
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESULT_CACHE_MAX_ENTRY_BYTES = int(os.getenv("RESULT_CACHE_MAX_ENTRY_BYTES", str(8 * 1024 * 1024)))
+RESULT_CACHE_COMPRESS = os.getenv("RESULT_CACHE_COMPRESS", "1") == "1"
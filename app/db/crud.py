@@ -1,32 +1,334 @@
+import os
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+from typing import Any, Dict, List, Sequence, Tuple
+from datetime import datetime
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from . import models, schemas
+from .database import begin_write
+from .search import search_by_name
+from ..metrics import timed
+from ..utils import folder_of, folder_chain
 
-def save_file_metadata(db: Session, data: schemas.FileMetadataCreate):
-    meta = models.FileMetadata(**data.dict())
+@timed("save_file_metadata")
+def save_file_metadata(db: Session, data: schemas.FileMetadataCreate, new_object: bool = False):
+    """
+    Inserts a file row. With `new_object`, also registers its stored
+    object for deduplication (ref_count 1) in the same transaction.
+    """
+    meta = models.FileMetadata(**data.dict(), folder=folder_of(data.stored_path))
     db.add(meta)
+    if new_object:
+        db.add(models.StoredObject(
+            checksum=data.checksum,
+            object_name=data.stored_path,
+            size_bytes=data.size_bytes,
+            ref_count=1
+        ))
+    generation = update_folder_stats(db, meta.folder, 1, meta.size_bytes)
     db.commit()
     db.refresh(meta)
+    meta.tree_generation = generation
     return meta
 
-def get_all_files(db: Session):
-    return db.query(models.FileMetadata).order_by(models.FileMetadata.id.desc()).all()
+
+@timed("save_file_metadata_batch")
+def save_file_metadata_batch(db: Session, entries: List[Tuple[schemas.FileMetadataCreate, str]]):
+    """
+    Inserts many file rows in one transaction. Each entry's mode is:
+    - "plain": no deduplication bookkeeping
+    - "new_object": registers the stored object (ref_count 1)
+    - "reference": adds a reference to an object registered earlier,
+      possibly by a previous entry of this batch
+    A "new_object" whose content was registered concurrently by another
+    upload references that object instead; its row's stored_path then
+    differs from the entry's, and the caller should remove its copy.
+    """
+    begin_write(db)
+    metas = []
+    for data, mode in entries:
+        if mode == "new_object":
+            try:
+                with db.begin_nested():
+                    db.add(models.StoredObject(
+                        checksum=data.checksum,
+                        object_name=data.stored_path,
+                        size_bytes=data.size_bytes,
+                        ref_count=1
+                    ))
+            except IntegrityError:
+                mode = "reference"
+
+        if mode == "reference":
+            stored = add_object_reference(db, data.checksum)
+            if stored is None:
+                raise ValueError(f"Stored object for {data.original_name} disappeared")
+            data = data.copy(update={"stored_path": stored.object_name})
+
+        meta = models.FileMetadata(**data.dict(), folder=folder_of(data.stored_path))
+        db.add(meta)
+        metas.append((meta, update_folder_stats(db, meta.folder, 1, meta.size_bytes)))
+
+    db.commit()
+    for meta, generation in metas:
+        db.refresh(meta)
+        meta.tree_generation = generation
+    return [meta for meta, _ in metas]
+
+
+def get_stored_objects(db: Session, checksums: List[str]) -> Dict[str, str]:
+    """
+    Maps each known checksum to its stored object name.
+    """
+    if not checksums:
+        return {}
+    rows = (
+        db.query(models.StoredObject.checksum, models.StoredObject.object_name)
+        .filter(models.StoredObject.checksum.in_(checksums))
+        .all()
+    )
+    return dict(rows)
+
+
+def create_pending_upload(db: Session, object_name: str, original_name: str, mime_type: str, expires_at: datetime):
+    obj = models.PendingUpload(
+        object_name=object_name,
+        original_name=original_name,
+        mime_type=mime_type,
+        expires_at=expires_at
+    )
+    db.add(obj)
+    db.commit()
+    db.refresh(obj)
+    return obj
+
+
+def get_pending_upload(db: Session, upload_id: int):
+    return db.query(models.PendingUpload).filter(models.PendingUpload.id == upload_id).first()
+
+
+def complete_pending_upload(db: Session, pending: models.PendingUpload, data: schemas.FileMetadataCreate):
+    """
+    Turns a reservation into a file row (one transaction). The
+    reservation is claimed with a conditional DELETE, so of two
+    concurrent completions only one records the file; the other gets
+    None.
+    """
+    begin_write(db)
+    table = models.PendingUpload
+    claimed = (
+        db.query(table)
+        .filter(table.id == pending.id)
+        .delete(synchronize_session=False)
+    )
+    if not claimed:
+        db.rollback()
+        return None
+    return save_file_metadata(db, data)
+
+
+def delete_expired_pending_uploads(db: Session, before: datetime) -> List[str]:
+    """
+    Deletes reservations that expired before `before` and returns their
+    object names: the client may have PUT an object that will never be
+    completed.
+    """
+    begin_write(db)
+    table = models.PendingUpload
+    names = db.execute(
+        delete(table).where(table.expires_at < before).returning(table.object_name)
+    ).scalars().all()
+    db.commit()
+    return list(names)
+
+
+def add_object_reference(db: Session, checksum: str):
+    """
+    If an object with this content already exists, increments its
+    ref_count (uncommitted; the caller's save_file_metadata commits it)
+    and returns it. Otherwise returns None.
+    """
+    table = models.StoredObject
+    updated = (
+        db.query(table)
+        .filter(table.checksum == checksum)
+        .update({table.ref_count: table.ref_count + 1}, synchronize_session=False)
+    )
+    if not updated:
+        return None
+    return db.query(table).filter(table.checksum == checksum).first()
+
+
+def delete_file_metadata(db: Session, meta: models.FileMetadata) -> bool:
+    """
+    Deletes a file row and releases its object reference.
+    Returns True if no other row uses the stored object, i.e. the caller
+    should remove it from MinIO.
+    """
+    folder = meta.folder if meta.folder is not None else folder_of(meta.stored_path)
+    begin_write(db)
+    remove_object = release_object_reference(db, meta.stored_path)
+    db.delete(meta)
+    generation = update_folder_stats(db, folder, -1, -meta.size_bytes)
+    db.commit()
+    meta.tree_generation = generation
+    return remove_object
+
+
+def release_object_reference(db: Session, object_name: str) -> bool:
+    """
+    Drops one reference to a stored object. The decrement happens in a
+    single UPDATE ... RETURNING so concurrent deletes of the last owners
+    cannot both see a count above one. Returns True when no reference is
+    left (the row is deleted too). Runs in the caller's transaction.
+    """
+    table = models.StoredObject
+    remaining = db.execute(
+        update(table)
+        .where(table.object_name == object_name)
+        .values(ref_count=table.ref_count - 1)
+        .returning(table.ref_count)
+    ).scalar_one_or_none()
+    if remaining is None:
+        # Stored before deduplication (or with it disabled): one owner.
+        return True
+
+    if remaining <= 0:
+        db.execute(delete(table).where(table.object_name == object_name))
+        return True
+    return False
+
+
+def update_folder_stats(db: Session, folder: str, count_delta: int, size_delta: int) -> int:
+    """
+    Adds the deltas to `folder` and all of its ancestors (upserting rows)
+    and bumps their generation. Runs in the caller's transaction.
+    Returns the root's new generation.
+    """
+    table = models.FolderStats
+    root_generation = 0
+    for path, parent in folder_chain(folder):
+        stmt = sqlite_insert(table).values(
+            path=path, parent=parent, file_count=count_delta, total_size=size_delta, generation=1
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.path],
+            set_={
+                "file_count": table.file_count + count_delta,
+                "total_size": table.total_size + size_delta,
+                "generation": func.coalesce(table.generation, 0) + 1,
+            }
+        )
+        if path == "":
+            root_generation = db.execute(stmt.returning(table.generation)).scalar()
+        else:
+            db.execute(stmt)
+    return root_generation
+
+
+def rebuild_folder_stats(db: Session):
+    """
+    Recomputes folder_stats (and backfills FileMetadata.folder) from the
+    files table. Only needed once for databases that predate folder_stats.
+    """
+    F = models.FileMetadata
+
+    for meta in db.query(F).filter(F.folder.is_(None)).yield_per(1000):
+        meta.folder = folder_of(meta.stored_path)
+    db.flush()
+
+    db.query(models.FolderStats).delete()
+    totals = (
+        db.query(F.folder, func.count(F.id), func.coalesce(func.sum(F.size_bytes), 0))
+        .group_by(F.folder)
+        .all()
+    )
+    for folder, count, size in totals:
+        update_folder_stats(db, folder, count, size)
+
+    if not totals:
+        update_folder_stats(db, "", 0, 0)
+    db.commit()
+
+
+def get_folder_stats(db: Session, path: str):
+    return db.query(models.FolderStats).filter(models.FolderStats.path == path).first()
 
 
-def search_files(db, query: str):
+def get_subfolder_stats(db: Session, path: str):
     return (
-        db.query(models.FileMetadata)
-        .filter(func.lower(models.FileMetadata.original_name).like(f"%{query.lower()}%"))
-        .order_by(models.FileMetadata.id.desc())
+        db.query(models.FolderStats)
+        .filter(models.FolderStats.parent == path)
+        .order_by(models.FolderStats.path)
         .all()
     )
 
+
+def get_files_in_folder(db: Session, folder: str, limit: int, before_id: int | None = None):
+    q = db.query(models.FileMetadata).filter(models.FileMetadata.folder == folder)
+    if before_id is not None:
+        q = q.filter(models.FileMetadata.id < before_id)
+    return q.order_by(models.FileMetadata.id.desc()).limit(limit).all()
+
+
+def get_tree_generation(db: Session) -> int:
+    """
+    Version of the files table: the root folder_stats generation, bumped
+    in the same transaction as every file insert and delete. A primary-key
+    read.
+    """
+    root = get_folder_stats(db, "")
+    return (root.generation or 0) if root else 0
+
+def get_all_files(db: Session):
+    return db.query(models.FileMetadata).order_by(models.FileMetadata.id.desc()).all()
+
+
+def list_rows(
+    db: Session,
+    model,
+    fields: List[str],
+    limit: int,
+    before_id: int | None = None,
+    conditions: Sequence = ()
+) -> List[Dict[str, Any]]:
+    """
+    One page of `model` rows as plain dicts, newest first, selecting only
+    `fields` (plus id, which is the cursor). Uses a Core SELECT so no ORM
+    objects are built.
+    """
+    table = model.__table__
+    if "id" not in fields:
+        fields = ["id"] + list(fields)
+
+    stmt = select(*[table.c[f] for f in fields])
+    for condition in conditions:
+        stmt = stmt.where(condition)
+    if before_id is not None:
+        stmt = stmt.where(table.c.id < before_id)
+    stmt = stmt.order_by(table.c.id.desc()).limit(limit)
+
+    return [dict(row) for row in db.execute(stmt).mappings()]
+
+
+def count_rows(db: Session, model, conditions: Sequence = ()) -> int:
+    stmt = select(func.count()).select_from(model.__table__)
+    for condition in conditions:
+        stmt = stmt.where(condition)
+    return db.execute(stmt).scalar()
+
+
+def search_files(db, query: str, limit: int = 50, offset: int = 0):
+    return search_by_name(db, models.FileMetadata, query, limit, offset)
+
 def create_json_dataset(db: Session, dataset: schemas.JsonDatasetCreate):
     obj = models.JsonDataset(
         storage_type=dataset.storage_type,
         sql_table_name=dataset.sql_table_name,
         mongo_collection_name=dataset.mongo_collection_name,
-        original_name=dataset.original_name
+        original_name=dataset.original_name,
+        indexes=dataset.indexes
     )
     db.add(obj)
     db.commit()
@@ -34,27 +336,104 @@ def create_json_dataset(db: Session, dataset: schemas.JsonDatasetCreate):
     return obj
 
 
-def update_json_dataset(db: Session, dataset_id: int, data: dict):
-    db.query(models.JsonDataset).filter(models.JsonDataset.id == dataset_id).update(data)
+def reserve_json_dataset(db: Session, job: Dict[str, Any] | None = None) -> models.JsonDataset:
+    """
+    Commits a placeholder row (storage_type "pending") so its id can name
+    the dataset's table/collection before any data is stored. Concurrent
+    ingests always get distinct ids. Pending rows are hidden from lookups
+    and listings until finalize_json_dataset().
+    `job` (IngestJob.to_dict()) is stored on the row for /jobs.
+    """
+    begin_write(db)
+    obj = models.JsonDataset(
+        storage_type=models.PENDING_DATASET,
+        job_id=job["id"] if job else None,
+        job=job,
+        job_owner=os.getpid()
+    )
+    db.add(obj)
     db.commit()
+    db.refresh(obj)
+    return obj
 
 
-def get_json_dataset(db: Session, dataset_id: int):
-    return db.query(models.JsonDataset).filter(models.JsonDataset.id == dataset_id).first()
+def get_reserved_json_dataset(db: Session, dataset_id: int):
+    return (
+        db.query(models.JsonDataset)
+        .filter(
+            models.JsonDataset.id == dataset_id,
+            models.JsonDataset.storage_type == models.PENDING_DATASET
+        )
+        .first()
+    )
 
-def search_json_datasets(db: Session, query: str):
-    return db.query(models.JsonDataset).filter(
-        models.JsonDataset.original_name.ilike(f"%{query}%")
-    ).all()
 
-def peek_next_json_dataset_id(db: Session) -> int:
+def get_pending_json_datasets(db: Session) -> List[models.JsonDataset]:
+    return (
+        db.query(models.JsonDataset)
+        .filter(models.JsonDataset.storage_type == models.PENDING_DATASET)
+        .order_by(models.JsonDataset.id.desc())
+        .all()
+    )
+
+
+def update_ingest_job(db: Session, dataset_id: int, updates: Dict[str, Any]):
     """
-    Returns the next auto-increment ID *before* inserting a new JsonDataset row.
-    Used to generate table/collection names safely.
+    Merges `updates` into the job state stored on a dataset row.
     """
-    last = (
+    begin_write(db)
+    obj = db.query(models.JsonDataset).filter(models.JsonDataset.id == dataset_id).first()
+    if obj is not None:
+        obj.job = {**(obj.job or {}), **updates}
+    db.commit()
+
+
+def get_ingest_job(db: Session, job_id: str) -> Dict[str, Any] | None:
+    row = (
+        db.query(models.JsonDataset.job)
+        .filter(models.JsonDataset.job_id == job_id)
+        .first()
+    )
+    return row[0] if row else None
+
+
+def finalize_json_dataset(db: Session, obj: models.JsonDataset, dataset: schemas.JsonDatasetCreate):
+    begin_write(db)
+    obj.storage_type = dataset.storage_type
+    obj.sql_table_name = dataset.sql_table_name
+    obj.mongo_collection_name = dataset.mongo_collection_name
+    obj.original_name = dataset.original_name
+    obj.indexes = dataset.indexes
+    db.commit()
+    db.refresh(obj)
+    return obj
+
+
+def release_json_dataset(db: Session, *dataset_ids: int):
+    begin_write(db)
+    (
         db.query(models.JsonDataset)
-        .order_by(models.JsonDataset.id.desc())
+        .filter(models.JsonDataset.id.in_(dataset_ids))
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+
+
+def update_json_dataset(db: Session, dataset_id: int, data: dict):
+    begin_write(db)
+    db.query(models.JsonDataset).filter(models.JsonDataset.id == dataset_id).update(data)
+    db.commit()
+
+
+def get_json_dataset(db: Session, dataset_id: int):
+    return (
+        db.query(models.JsonDataset)
+        .filter(
+            models.JsonDataset.id == dataset_id,
+            models.JsonDataset.storage_type != models.PENDING_DATASET
+        )
         .first()
     )
-    return (last.id + 1) if last else 1
+
+def search_json_datasets(db: Session, query: str, limit: int = 50, offset: int = 0):
+    return search_by_name(db, models.JsonDataset, query, limit, offset)
@@ -1,7 +1,9 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import os
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
 
-DATABASE_URL = "sqlite:///./files.db"
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./files.db")
 
 engine = create_engine(
     DATABASE_URL, connect_args={"check_same_thread": False}
@@ -10,3 +12,56 @@ engine = create_engine(
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
 Base = declarative_base()
+
+
+def add_missing_columns(bind: Engine):
+    """
+    create_all() never alters tables that already exist, so columns added
+    to the models later are appended here with ALTER TABLE, and any
+    declared indexes that are missing are created.
+    """
+    inspector = inspect(bind)
+
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for col in table.columns:
+                if col.name in existing:
+                    continue
+                col_type = col.type.compile(dialect=bind.dialect)
+                conn.execute(text(
+                    f'ALTER TABLE "{table.name}" ADD COLUMN "{col.name}" {col_type}'
+                ))
+
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+
+def enable_wal(bind: Engine):
+    """
+    Switches a SQLite database to WAL once at startup so readers and
+    concurrent dataset loads don't block each other. The mode is stored
+    in the database file.
+    """
+    if bind.dialect.name != "sqlite":
+        return
+    with bind.connect() as conn:
+        conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+
+
+def begin_write(db: Session):
+    """
+    On SQLite, starts the session's transaction with BEGIN IMMEDIATE so
+    it waits (busy_timeout) for concurrent writers up front. A deferred
+    transaction that has already read fails at once with "database is
+    locked" when it tries to write while another connection holds the
+    write lock, which concurrent dataset ingests hit constantly.
+    """
+    if db.get_bind().dialect.name != "sqlite":
+        return
+    dbapi_connection = db.connection().connection.dbapi_connection
+    if not dbapi_connection.in_transaction:
+        dbapi_connection.execute("BEGIN IMMEDIATE")
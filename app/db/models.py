@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, JSON, LargeBinary
 from datetime import datetime
 from .database import Base
 
@@ -10,15 +10,81 @@ class FileMetadata(Base):
     stored_path = Column(String, nullable=False)
     mime_type = Column(String, nullable=False)
     size_bytes = Column(Integer, nullable=False)
+    checksum = Column(String, nullable=True, index=True)   # sha256 hex of the stored bytes
+    folder = Column(String, nullable=True, index=True)   # stored_path minus the object name
+    # Derived preview image: "pending", "ready", "failed" or "unsupported"
+    thumbnail_path = Column(String, nullable=True)
+    thumbnail_status = Column(String, nullable=True)
     uploaded_at = Column(DateTime, default=datetime.utcnow)
     
 
+class StoredObject(Base):
+    """
+    A deduplicated MinIO object and how many FileMetadata rows use it.
+    """
+    __tablename__ = "stored_objects"
+
+    id = Column(Integer, primary_key=True, index=True)
+    checksum = Column(String, nullable=False, unique=True)
+    object_name = Column(String, nullable=False, unique=True)
+    size_bytes = Column(Integer, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=1)
+
+
+class PendingUpload(Base):
+    """
+    An object path reserved for a direct-to-MinIO (presigned PUT) upload,
+    waiting for the client to call /upload/complete.
+    """
+    __tablename__ = "pending_uploads"
+
+    id = Column(Integer, primary_key=True, index=True)
+    object_name = Column(String, nullable=False, unique=True)
+    original_name = Column(String, nullable=False)
+    mime_type = Column(String, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+
+class ImageFeature(Base):
+    """
+    Perceptual features of a stored image, used to place new uploads in
+    the category folder of similar images.
+    """
+    __tablename__ = "image_features"
+
+    id = Column(Integer, primary_key=True, index=True)
+    object_name = Column(String, nullable=False, index=True)
+    category = Column(String, nullable=False)
+    dhash = Column(LargeBinary, nullable=False)       # 64-bit difference hash (8 bytes)
+    histogram = Column(LargeBinary, nullable=False)   # 64-bin RGB histogram, float32
+
+
+class FolderStats(Base):
+    """
+    Per-folder file count and size (including subfolders), maintained on
+    every upload and delete. The root row has path "" and parent NULL.
+    """
+    __tablename__ = "folder_stats"
+
+    path = Column(String, primary_key=True)
+    parent = Column(String, nullable=True, index=True)
+    file_count = Column(Integer, nullable=False, default=0)
+    total_size = Column(Integer, nullable=False, default=0)
+    # Bumped by every insert/delete below this folder; the root's value
+    # versions the whole files table (see FileTreeCache).
+    generation = Column(Integer, nullable=True, default=0)
+
+
+# storage_type of a dataset row reserved while its data is being loaded.
+PENDING_DATASET = "pending"
+
+
 class JsonDataset(Base):
     __tablename__ = "json_datasets"
 
     id = Column(Integer, primary_key=True, index=True)
 
-    # "sql" or "nosql"
+    # "sql" or "nosql" ("pending" while loading, or if loading failed)
     storage_type = Column(String, nullable=False)
 
     # Only used when SQL-like JSON is stored
@@ -30,5 +96,16 @@ class JsonDataset(Base):
     # Optional: the original filename if it came from a .json upload
     original_name = Column(String, nullable=True)
 
+    # Fields with a secondary index, e.g. ["user_id", "email"]
+    indexes = Column(JSON, nullable=True)
+
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    # Ingestion job that loads the dataset: its id, its state as
+    # IngestJob.to_dict() (readable from any API worker), and the pid of
+    # the API process running it, so a restart can tell abandoned
+    # reservations from live ones.
+    job_id = Column(String, nullable=True, index=True)
+    job = Column(JSON, nullable=True)
+    job_owner = Column(Integer, nullable=True)
+
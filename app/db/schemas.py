@@ -1,11 +1,13 @@
 from pydantic import BaseModel
 from datetime import datetime
+from typing import List
 
 class FileMetadataCreate(BaseModel):
     original_name: str
     stored_path: str
     mime_type: str
     size_bytes: int
+    checksum: str | None = None
 
 class FileMetadataResponse(FileMetadataCreate):
     id: int
@@ -19,6 +21,7 @@ class JsonDatasetCreate(BaseModel):
     sql_table_name: str | None = None
     mongo_collection_name: str | None = None
     original_name: str | None = None
+    indexes: List[str] | None = None
 
 
 class JsonDatasetResponse(JsonDatasetCreate):
@@ -0,0 +1,130 @@
+import logging
+from typing import Dict, List
+from sqlalchemy import text, inspect
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Trigram tokens need at least this many characters; shorter queries fall
+# back to an indexed prefix match on the name.
+MIN_TRIGRAM_QUERY = 3
+
+# (FTS table, content table) pairs indexed on original_name.
+SEARCH_INDEXES = [
+    ("files_fts", "files"),
+    ("json_datasets_fts", "json_datasets"),
+]
+
+# FTS table -> whether it exists in this database.
+_fts_available: Dict[str, bool] = {}
+
+
+def ensure_search_indexes(engine: Engine):
+    """
+    Creates SQLite FTS5 trigram indexes over original_name for files and
+    JSON datasets, plus triggers that keep them in sync on every insert,
+    update and delete. Newly created indexes are filled from the
+    existing rows. If this SQLite build cannot create them (no FTS5, or
+    older than 3.34 without the trigram tokenizer), search uses LIKE.
+    """
+    existing = set(inspect(engine).get_table_names())
+
+    with engine.begin() as conn:
+        for fts, table in SEARCH_INDEXES:
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS ix_{table}_original_name_nocase "
+                f"ON {table} (original_name COLLATE NOCASE)"
+            ))
+
+    for fts, table in SEARCH_INDEXES:
+        if fts in existing:
+            _fts_available[fts] = True
+            continue
+        try:
+            with engine.begin() as conn:
+                _create_fts_index(conn, fts, table)
+            _fts_available[fts] = True
+        except OperationalError as e:
+            _fts_available[fts] = False
+            logger.warning("Cannot create FTS5 index %s, name search falls back to LIKE: %s", fts, e.orig)
+
+
+def _create_fts_index(conn: Connection, fts: str, table: str):
+    conn.execute(text(
+        f"CREATE VIRTUAL TABLE {fts} USING fts5("
+        f"original_name, content='{table}', content_rowid='id', tokenize='trigram')"
+    ))
+    conn.execute(text(
+        f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, original_name) VALUES (new.id, new.original_name); END"
+    ))
+    conn.execute(text(
+        f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, original_name) "
+        f"VALUES ('delete', old.id, old.original_name); END"
+    ))
+    conn.execute(text(
+        f"CREATE TRIGGER {fts}_au AFTER UPDATE OF original_name ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, original_name) "
+        f"VALUES ('delete', old.id, old.original_name); "
+        f"INSERT INTO {fts}(rowid, original_name) VALUES (new.id, new.original_name); END"
+    ))
+    conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+
+
+def _has_fts_index(db: Session, fts: str) -> bool:
+    if fts not in _fts_available:
+        _fts_available[fts] = inspect(db.get_bind()).has_table(fts)
+    return _fts_available[fts]
+
+
+def _fts_phrase(query: str) -> str:
+    return '"' + query.replace('"', '""') + '"'
+
+
+def _like_escape(query: str) -> str:
+    return query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _like_prefix(query: str) -> str:
+    return _like_escape(query) + "%"
+
+
+def search_by_name(db: Session, model, query: str, limit: int, offset: int = 0) -> List:
+    """
+    Ranked, paginated substring search on `model.original_name`.
+    Names starting with the query come first, then FTS5 bm25 rank, then
+    newest. Queries shorter than three characters are prefix-only.
+    Without the FTS5 index, substrings are matched with a LIKE scan.
+    """
+    table = model.__tablename__
+    fts = f"{table}_fts"
+    params = {"prefix": _like_prefix(query), "limit": limit, "offset": offset}
+
+    if len(query) < MIN_TRIGRAM_QUERY:
+        sql = (
+            f"SELECT {table}.* FROM {table} "
+            f"WHERE original_name LIKE :prefix ESCAPE '\\' "
+            f"ORDER BY id DESC LIMIT :limit OFFSET :offset"
+        )
+    elif not _has_fts_index(db, fts):
+        params["contains"] = "%" + _like_escape(query) + "%"
+        sql = (
+            f"SELECT {table}.* FROM {table} "
+            f"WHERE original_name LIKE :contains ESCAPE '\\' "
+            f"ORDER BY (original_name LIKE :prefix ESCAPE '\\') DESC, id DESC "
+            f"LIMIT :limit OFFSET :offset"
+        )
+    else:
+        params["match"] = _fts_phrase(query)
+        sql = (
+            f"SELECT {table}.* FROM {fts} JOIN {table} ON {table}.id = {fts}.rowid "
+            f"WHERE {fts} MATCH :match "
+            f"ORDER BY ({table}.original_name LIKE :prefix ESCAPE '\\') DESC, "
+            f"{fts}.rank, {table}.id DESC "
+            f"LIMIT :limit OFFSET :offset"
+        )
+
+    return db.query(model).from_statement(text(sql)).params(**params).all()
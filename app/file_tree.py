@@ -0,0 +1,139 @@
+import json
+import threading
+from typing import Any, Dict
+from sqlalchemy.orm import Session
+from .db import crud, models
+
+
+def file_info(f: models.FileMetadata) -> Dict[str, Any]:
+    return {
+        "id": f.id,
+        "name": f.original_name or f.stored_path.split("/")[-1],
+        "stored_path": f.stored_path,
+        "mime_type": f.mime_type,
+        "size_bytes": f.size_bytes,
+        "created_at": f.created_at.isoformat() if getattr(f, "created_at", None) else None,
+    }
+
+
+def add_to_tree(tree: Dict[str, Any], f: models.FileMetadata):
+    """
+    tree = { category: { subfolder: [files] } or [files] }
+    """
+    if not f.stored_path:
+        return
+
+    parts = f.stored_path.split("/")
+    category = parts[0]
+    subfolder: str | None = None
+
+    if len(parts) >= 3:
+        subfolder = parts[1]
+
+    info = file_info(f)
+
+    if subfolder:
+        if category not in tree or not isinstance(tree[category], dict):
+            tree[category] = {}
+        if subfolder not in tree[category]:
+            tree[category][subfolder] = []
+        tree[category][subfolder].append(info)
+    else:
+        if category not in tree or isinstance(tree[category], dict):
+            tree[category] = []
+        tree[category].append(info)
+
+
+def remove_from_tree(tree: Dict[str, Any], file_id: int, stored_path: str):
+    parts = stored_path.split("/")
+    category = parts[0]
+    node = tree.get(category)
+
+    if isinstance(node, dict) and len(parts) >= 3:
+        files = node.get(parts[1], [])
+        node[parts[1]] = [i for i in files if i["id"] != file_id]
+        if not node[parts[1]]:
+            del node[parts[1]]
+        if not node:
+            del tree[category]
+    elif isinstance(node, list):
+        tree[category] = [i for i in node if i["id"] != file_id]
+        if not tree[category]:
+            del tree[category]
+
+
+class FileTreeCache:
+    """
+    In-process copy of the /files/tree response, updated incrementally on
+    upload and delete and kept alongside its serialized JSON body. Each
+    read compares the files table's generation counter (root folder_stats
+    row, bumped by every insert and delete) with the one the cache was
+    built for, so changes made by other workers trigger a rebuild.
+    A local change is applied in place only if it is the very next
+    generation; otherwise the cache rebuilds on the next read.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tree: Dict[str, Any] | None = None
+        self._body: bytes | None = None
+        self._generation: int | None = None
+
+    def get_json(self, db: Session) -> bytes:
+        # Read before the rows: a change landing in between only causes
+        # one extra rebuild.
+        generation = crud.get_tree_generation(db)
+
+        with self._lock:
+            if self._tree is None or generation != self._generation:
+                tree: Dict[str, Any] = {}
+                for f in db.query(models.FileMetadata).yield_per(1000):
+                    add_to_tree(tree, f)
+                self._tree = tree
+                self._body = None
+                self._generation = generation
+
+            if self._body is None:
+                self._body = json.dumps(self._tree).encode()
+            return self._body
+
+    def add(self, f: models.FileMetadata):
+        """
+        `f` comes from crud.save_file_metadata(_batch), which sets
+        `tree_generation` to the generation its insert committed.
+        """
+        with self._lock:
+            if self._apply(getattr(f, "tree_generation", None)):
+                add_to_tree(self._tree, f)
+
+    def remove(self, f: models.FileMetadata):
+        """
+        `f` was passed to crud.delete_file_metadata.
+        """
+        with self._lock:
+            if self._apply(getattr(f, "tree_generation", None)):
+                remove_from_tree(self._tree, f.id, f.stored_path)
+
+    def _apply(self, generation: int | None) -> bool:
+        if self._tree is None:
+            return False
+        if generation is not None and self._generation is not None:
+            if generation <= self._generation:
+                # Already rebuilt from a state that includes the change.
+                return False
+            if generation == self._generation + 1:
+                self._generation = generation
+                self._body = None
+                return True
+        # Another worker changed the table in between.
+        self._tree = None
+        return False
+
+    def clear(self):
+        with self._lock:
+            self._tree = None
+            self._body = None
+            self._generation = None
+
+
+tree_cache = FileTreeCache()
@@ -0,0 +1,378 @@
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field, asdict, replace
+from datetime import datetime
+from typing import Any, BinaryIO, Dict
+
+from .config import INGEST_WORKERS, MAX_PENDING_INGEST_JOBS, INGEST_JOB_HISTORY
+from .db import crud
+from .db.database import SessionLocal
+from .metrics import collect_spans, observe_spans
+
+logger = logging.getLogger(__name__)
+
+# Minimum seconds between progress messages from a worker.
+PROGRESS_INTERVAL = 0.5
+
+
+class JobQueueFull(Exception):
+    """
+    MAX_PENDING_INGEST_JOBS jobs are already queued or running.
+    """
+
+
+@dataclass
+class IngestJob:
+    id: str
+    original_name: str | None
+    status: str = "queued"      # "queued", "running", "done" or "failed"
+    rows_written: int = 0
+    rows_per_sec: float = 0.0
+    dataset_id: int | None = None
+    result: Dict[str, Any] | None = None
+    error: str | None = None
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        out = asdict(self)
+        for key in ("created_at", "started_at", "finished_at"):
+            if out[key] is not None:
+                out[key] = out[key].isoformat()
+        return out
+
+
+class IngestJobs:
+    """
+    Runs JSON ingestion in a pool of worker processes so upload requests
+    return a job id immediately instead of holding the connection for
+    the whole classify + store cycle.
+    Workers report progress over a queue; job state is kept in memory
+    in this process, with the last `history` finished jobs retained.
+    Each job also reserves its dataset row up front and its state is
+    saved there when it starts and ends, so any API worker can answer
+    /jobs and a restart can clean up after jobs that never finished.
+    """
+
+    def __init__(self, workers: int, max_pending: int, history: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.history = history
+        self._lock = threading.Lock()
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._pending = 0
+        self._pool: ProcessPoolExecutor | None = None
+        self._queue = None
+        self._listener: threading.Thread | None = None
+
+    def submit(self, original_name: str | None, path: str | None = None, data: Any = None) -> IngestJob:
+        """
+        Queues ingestion of a spooled JSON file at `path` (removed once the
+        job ends) or of already-parsed `data`.
+        """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                _remove(path)
+                raise JobQueueFull()
+            self._pending += 1
+
+        job = IngestJob(id=uuid.uuid4().hex, original_name=original_name)
+        try:
+            with SessionLocal() as db:
+                dataset_id = crud.reserve_json_dataset(db, job.to_dict()).id
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            _remove(path)
+            raise
+
+        with self._lock:
+            pool = self._start()
+            self._jobs[job.id] = job
+            self._trim()
+
+        try:
+            future = pool.submit(_run_job, job.id, dataset_id, path, data, original_name)
+        except Exception as e:
+            self._finish(job.id, dataset_id, path, error=e)
+            return job
+
+        future.add_done_callback(lambda f: self._finish(job.id, dataset_id, path, future=f))
+        return job
+
+    def get(self, job_id: str) -> IngestJob | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return counts
+
+    def recover(self):
+        """
+        Run at startup. Fails the jobs of reservations whose API process
+        is gone (a crash or restart mid-ingest) and drops their partial
+        table/collection, then keeps only the newest `history` failed
+        reservations.
+        """
+        with SessionLocal() as db:
+            failed, orphaned = [], []
+            for row in crud.get_pending_json_datasets(db):
+                job = row.job or {}
+                if job.get("status") == "failed":
+                    failed.append(row.id)
+                    continue
+                with self._lock:
+                    if row.job_id in self._jobs or _owner_alive(row.job_owner):
+                        continue
+                _discard(db, row.id, {
+                    "status": "failed",
+                    "error": "Interrupted: the server stopped before the job finished",
+                    "finished_at": datetime.utcnow().isoformat(),
+                })
+                # Reservations from before jobs were saved can't be polled.
+                (failed if row.job_id else orphaned).append(row.id)
+
+            stale = orphaned + failed[self.history:]
+            if stale:
+                crud.release_json_dataset(db, *stale)
+
+    def shutdown(self):
+        with self._lock:
+            pool, queue = self._pool, self._queue
+            self._pool = None
+            # The listener exits on None; the next pool gets a new queue
+            # and listener.
+            self._queue = self._listener = None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+        if queue is not None:
+            queue.put(None)
+
+    def _start(self) -> ProcessPoolExecutor:
+        # Workers are spawned, not forked, so they never inherit this
+        # process's open SQLite / Mongo connections.
+        if self._pool is None:
+            ctx = multiprocessing.get_context("spawn")
+            if self._queue is None:
+                self._queue = ctx.Queue()
+                self._listener = threading.Thread(
+                    target=self._listen, args=(self._queue,), name="ingest-progress", daemon=True
+                )
+                self._listener.start()
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=ctx,
+                initializer=_init_worker,
+                initargs=(self._queue,)
+            )
+        return self._pool
+
+    def _listen(self, queue):
+        while True:
+            message = queue.get()
+            if message is None:
+                return
+            job_id, updates = message
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None or job.status in ("done", "failed"):
+                    continue
+                for key, value in updates.items():
+                    setattr(job, key, value)
+
+    def _finish(
+        self,
+        job_id: str,
+        dataset_id: int,
+        path: str | None,
+        future: Future | None = None,
+        error: Exception | None = None
+    ):
+        if future is not None:
+            try:
+                status, payload, spans = future.result()
+                # Spans were timed in the worker process.
+                observe_spans(spans)
+            except Exception as e:
+                status, payload = "failed", str(e) or type(e).__name__
+                if isinstance(e, BrokenProcessPool):
+                    # A worker died; start a fresh pool for the next job.
+                    with self._lock:
+                        self._pool = None
+        else:
+            status, payload = "failed", str(error)
+
+        _remove(path)
+
+        with self._lock:
+            self._pending -= 1
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            finished = replace(job, status=status, finished_at=datetime.utcnow())
+
+        if status == "done":
+            finished.result = payload
+            finished.dataset_id = payload.get("dataset_id")
+            finished.rows_written = payload.get("rows", payload.get("documents", job.rows_written))
+            finished.rows_per_sec = payload.get("rows_per_sec") or _throughput(finished)
+        else:
+            finished.error = payload
+
+        # Saved before it shows here, so once this process reports the job
+        # finished, every worker does.
+        try:
+            with SessionLocal() as db:
+                if status == "done":
+                    crud.update_ingest_job(db, dataset_id, finished.to_dict())
+                else:
+                    _discard(db, dataset_id, finished.to_dict())
+        except Exception as e:
+            logger.warning("Could not save ingestion job %s: %s", job_id, e)
+
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id] = finished
+
+    def _trim(self):
+        finished = [
+            job_id for job_id, job in self._jobs.items()
+            if job.status in ("done", "failed")
+        ]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[job_id]
+
+
+def save_upload(fp: BinaryIO, suffix: str) -> str:
+    """
+    Copies an uploaded file to a named temp file a worker process can
+    open. Returns its path.
+    """
+    fp.seek(0)
+    fd, path = tempfile.mkstemp(prefix="ingest_", suffix=suffix)
+    with os.fdopen(fd, "wb") as out:
+        shutil.copyfileobj(fp, out, 1024 * 1024)
+    return path
+
+
+def _remove(path: str | None):
+    if path is None:
+        return
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _discard(db, dataset_id: int, state: Dict[str, Any]):
+    """
+    Saves a failed job's state and, if its dataset was never finalized,
+    drops whatever it stored.
+    """
+    from .json_ingestion.manager import discard_dataset_data
+
+    if crud.get_reserved_json_dataset(db, dataset_id) is not None:
+        try:
+            discard_dataset_data(db, dataset_id)
+        except Exception as e:
+            logger.warning("Could not drop partial data of dataset %s: %s", dataset_id, e)
+    crud.update_ingest_job(db, dataset_id, state)
+
+
+def _owner_alive(pid: int | None) -> bool:
+    if pid is None or pid == os.getpid():
+        # This process has only just started: its old jobs are gone.
+        return False
+    if os.name == "nt":
+        # No safe way to probe another process; leave it alone.
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _throughput(job: IngestJob) -> float:
+    if job.started_at is None or job.finished_at is None:
+        return 0.0
+    seconds = (job.finished_at - job.started_at).total_seconds()
+    return round(job.rows_written / seconds, 1) if seconds > 0 else float(job.rows_written)
+
+
+# ---- worker process side ----
+
+_progress_queue = None
+
+
+def _init_worker(queue):
+    global _progress_queue
+    _progress_queue = queue
+
+
+def _report(job_id: str, **updates):
+    _progress_queue.put((job_id, updates))
+
+
+def _run_job(job_id: str, dataset_id: int, path: str | None, data: Any, original_name: str | None):
+    from fastapi import HTTPException
+    from .json_ingestion.manager import ingest_json, ingest_json_stream
+
+    started_at = datetime.utcnow()
+    _report(job_id, status="running", started_at=started_at)
+    started = time.perf_counter()
+    last_report = [0.0]
+
+    def progress(rows: int):
+        now = time.perf_counter()
+        if now - last_report[0] < PROGRESS_INTERVAL:
+            return
+        last_report[0] = now
+        elapsed = now - started
+        _report(
+            job_id,
+            rows_written=rows,
+            rows_per_sec=round(rows / elapsed, 1) if elapsed > 0 else float(rows)
+        )
+
+    db = SessionLocal()
+    with collect_spans() as spans:
+        try:
+            crud.update_ingest_job(
+                db, dataset_id, {"status": "running", "started_at": started_at.isoformat()}
+            )
+            if path is not None:
+                with open(path, "rb") as fp:
+                    result = ingest_json_stream(
+                        db, fp, original_name=original_name, progress=progress, dataset_id=dataset_id
+                    )
+            else:
+                result = ingest_json(
+                    db, data, original_name=original_name, progress=progress, dataset_id=dataset_id
+                )
+            return "done", result, spans
+        except HTTPException as e:
+            return "failed", str(e.detail), spans
+        except Exception as e:
+            return "failed", str(e), spans
+        finally:
+            db.close()
+
+
+ingest_jobs = IngestJobs(INGEST_WORKERS, MAX_PENDING_INGEST_JOBS, INGEST_JOB_HISTORY)
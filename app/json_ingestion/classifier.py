@@ -1,33 +1,203 @@
+import math
+from heapq import heappush, heapreplace
 from typing import Any, List, Dict
+from app.metrics import timed
 
-def is_sql_like(data: Any) -> bool:
+# Scalar types ordered by how they widen: a column seen as int and float
+# is float; anything mixed with str is str.
+TYPE_ORDER = ["null", "bool", "int", "float", "str"]
+
+# Size of the distinct-value sketch per column. Below this many distinct
+# values the count is exact.
+DISTINCT_SKETCH_SIZE = 1024
+
+_HASH_SPACE = 2 ** 64
+
+
+def type_name(value: Any) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return "int"
+    if isinstance(value, float):
+        return "float"
+    if isinstance(value, str):
+        return "str"
+    return "nested"
+
+
+def widen(current: str, new: str) -> str:
+    if current == "nested" or new == "nested":
+        return "nested"
+    return max(current, new, key=TYPE_ORDER.index)
+
+
+class DistinctSketch:
+    """
+    K-minimum-values estimate of the number of distinct values.
+    Exact while fewer than `k` distinct values have been seen.
+    """
+
+    def __init__(self, k: int = DISTINCT_SKETCH_SIZE):
+        self.k = k
+        self._heap: List[int] = []      # negated hashes: max-heap of the k smallest
+        self._members = set()
+
+    def add(self, value: Any):
+        try:
+            h = hash((type(value).__name__, value)) % _HASH_SPACE
+        except TypeError:
+            return
+
+        if h in self._members:
+            return
+        if len(self._heap) < self.k:
+            heappush(self._heap, -h)
+            self._members.add(h)
+        elif h < -self._heap[0]:
+            removed = -heapreplace(self._heap, -h)
+            self._members.discard(removed)
+            self._members.add(h)
+
+    def estimate(self) -> int:
+        if len(self._heap) < self.k:
+            return len(self._heap)
+        return int((self.k - 1) * _HASH_SPACE / (-self._heap[0] + 1))
+
+
+class ColumnProfile:
+    def __init__(self, name: str):
+        self.name = name
+        self.type = "null"
+        self.count = 0          # rows where the key is present
+        self.nulls = 0
+        self.max_length = 0     # longest str value
+        self.distinct = DistinctSketch()
+
+    @property
+    def nullable(self) -> bool:
+        return self.nulls > 0
+
+    def add(self, value: Any):
+        self.count += 1
+        kind = type_name(value)
+        self.type = widen(self.type, kind)
+
+        if kind == "null":
+            self.nulls += 1
+            return
+        if kind == "str":
+            self.max_length = max(self.max_length, len(value))
+        if kind != "nested":
+            self.distinct.add(value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "type": self.type,
+            "nullable": self.nullable,
+            "distinct": self.distinct.estimate(),
+            "max_length": self.max_length,
+        }
+
+
+class SchemaProfile:
+    """
+    Result of one classification pass over a JSON payload.
+    `sql_like` is the SQL/NoSQL decision; `columns` carries the
+    per-field statistics used for DDL and index selection.
     """
+
+    def __init__(self):
+        self.sql_like = False
+        self.rows_seen = 0
+        self.sampled = False
+        self.columns: Dict[str, ColumnProfile] = {}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "rows_profiled": self.rows_seen,
+            "sampled": self.sampled,
+            "columns": {name: col.to_dict() for name, col in self.columns.items()},
+        }
+
+
+@timed("profile_json")
+def profile_json(data: Any, sample_size: int | None = None) -> SchemaProfile:
+    """
+    Profiles JSON in a single pass.
     JSON is considered SQL-like if:
       - it is a list
       - every element is a dict
       - keys match across all rows (consistent schema)
       - values are primitives (str, int, float, bool, None)
+    With `sample_size`, at most that many rows, spread evenly across the
+    list, are examined; `sampled` is then set and the decision is only
+    a prediction for the remaining rows.
     """
+    profile = SchemaProfile()
 
+    if not isinstance(data, list) or len(data) == 0:
+        return profile
 
-    if not isinstance(data, list):
-        return False
+    rows = data
+    if sample_size and len(data) > sample_size:
+        step = math.ceil(len(data) / sample_size)
+        rows = data[::step]
+        profile.sampled = True
 
-    if len(data) == 0:
-        return False
+    sql_like = True
+    base_keys = rows[0].keys() if isinstance(rows[0], dict) else None
 
+    for item in rows:
+        profile.rows_seen += 1
 
-    if not all(isinstance(item, dict) for item in data):
-        return False
+        if not isinstance(item, dict):
+            sql_like = False
+            continue
 
-    base_keys = set(data[0].keys())
+        if sql_like and item.keys() != base_keys:
+            sql_like = False
 
-    for item in data:
-        if set(item.keys()) != base_keys:
-            return False
+        for key, value in item.items():
+            col = profile.columns.get(key)
+            if col is None:
+                col = profile.columns[key] = ColumnProfile(key)
+            col.add(value)
 
-        for v in item.values():
-            if isinstance(v, (dict, list)):
-                return False
+    if any(col.type == "nested" for col in profile.columns.values()):
+        sql_like = False
+
+    profile.sql_like = sql_like
+    return profile
+
+
+@timed("is_sql_like")
+def is_sql_like(data: Any) -> bool:
+    return profile_json(data).sql_like
+
+
+def matches_sql_row(item: Any, column_types: Dict[str, str]) -> bool:
+    """
+    True if `item` is a flat dict with exactly the keys of `column_types`
+    (column name -> profiled type) and every value fits its column: null,
+    or a type that widens into the column's type (an int fits a float
+    column, a float does not fit an int column).
+    Used as a running check on rows arriving after classification.
+    """
+    if not isinstance(item, dict) or item.keys() != column_types.keys():
+        return False
+
+    for key, value in item.items():
+        kind = type_name(value)
+        if kind == "null":
+            continue
+        # All-null columns are created as strings.
+        column = column_types[key]
+        if column == "null":
+            column = "str"
+        if widen(column, kind) != column:
+            return False
 
     return True
@@ -0,0 +1,205 @@
+import json
+import os
+import tempfile
+from typing import Any, Dict, Iterator, List, NamedTuple, Tuple
+from bson import ObjectId
+from minio import Minio
+from pymongo.database import Database
+from sqlalchemy import Boolean, Float, Integer, MetaData, Table, select
+from sqlalchemy.engine import Engine
+
+from app.config import EXPORT_BATCH_ROWS
+from app.db import models
+from app.json_ingestion.classifier import type_name, widen
+from app.metrics import timed
+from app.storage import put_stream
+
+# Exports live next to thumbnails under the derived prefix, outside the
+# file tree: derived/exports/json_ds_<id>_<created_at>.parquet
+EXPORT_PREFIX = "derived/exports/"
+
+# format -> (file extension, content type)
+EXPORT_FORMATS = {
+    "parquet": (".parquet", "application/vnd.apache.parquet"),
+    # Arrow IPC file (Feather v2), uncompressed so readers can memory-map
+    # it and use the columns without copying.
+    "arrow": (".arrow", "application/vnd.apache.arrow.file"),
+}
+
+
+class ExportUnavailable(Exception):
+    """
+    pyarrow is not installed.
+    """
+
+
+class ExportInfo(NamedTuple):
+    object_name: str
+    format: str
+    rows: int
+    size_bytes: int
+
+
+def export_object_name(meta: models.JsonDataset, fmt: str) -> str:
+    """
+    Dataset ids are reused after a delete, so the name also carries the
+    row's creation time: a new dataset never finds, and is never served,
+    an export left behind by an earlier one with the same id.
+    """
+    version = meta.created_at.strftime("%Y%m%dT%H%M%S%f") if meta.created_at else "0"
+    return f"{EXPORT_PREFIX}json_ds_{meta.id}_{version}{EXPORT_FORMATS[fmt][0]}"
+
+
+def export_object_names(meta: models.JsonDataset) -> List[str]:
+    """
+    Every object an export of the dataset may be stored as, including
+    the unversioned names of exports made before they were versioned.
+    """
+    names = []
+    for fmt, (ext, _) in EXPORT_FORMATS.items():
+        names.append(export_object_name(meta, fmt))
+        names.append(f"{EXPORT_PREFIX}json_ds_{meta.id}{ext}")
+    return names
+
+
+@timed("export_dataset")
+def export_dataset(
+    engine: Engine,
+    mongo_db: Database,
+    meta: models.JsonDataset,
+    client: Minio,
+    bucket: str,
+    fmt: str = "parquet",
+    batch_size: int = EXPORT_BATCH_ROWS
+) -> ExportInfo:
+    """
+    Writes a dataset's SQL table or Mongo collection to a columnar file
+    (Parquet or Arrow IPC) in `batch_size`-row record batches, then
+    uploads it to the bucket. Nested NoSQL values become JSON strings.
+    """
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ExportUnavailable("Columnar export requires pyarrow")
+
+    if meta.storage_type == "sql":
+        schema, batches = _sql_batches(pa, engine, meta.sql_table_name, batch_size)
+    else:
+        schema, batches = _nosql_batches(pa, mongo_db, meta.mongo_collection_name, batch_size)
+
+    fd, path = tempfile.mkstemp(prefix="export_", suffix=EXPORT_FORMATS[fmt][0])
+    os.close(fd)
+    try:
+        rows = _write(pa, fmt, path, schema, batches)
+
+        object_name = export_object_name(meta, fmt)
+        with open(path, "rb") as fp:
+            size_bytes, _ = put_stream(
+                client, bucket, object_name, fp, content_type=EXPORT_FORMATS[fmt][1]
+            )
+    finally:
+        os.remove(path)
+
+    return ExportInfo(object_name, fmt, rows, size_bytes)
+
+
+def _write(pa, fmt: str, path: str, schema, batches: Iterator) -> int:
+    rows = 0
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(path, schema, compression="zstd")
+    else:
+        writer = pa.ipc.new_file(path, schema)
+
+    try:
+        for batch in batches:
+            if fmt == "parquet":
+                writer.write_table(pa.Table.from_batches([batch]))
+            else:
+                writer.write_batch(batch)
+            rows += batch.num_rows
+    finally:
+        writer.close()
+    return rows
+
+
+def _arrow_type(pa, column):
+    if isinstance(column.type, Boolean):
+        return pa.bool_()
+    if isinstance(column.type, Integer):
+        return pa.int64()
+    if isinstance(column.type, Float):
+        return pa.float64()
+    return pa.string()
+
+
+def _sql_batches(pa, engine: Engine, table_name: str, batch_size: int) -> Tuple[Any, Iterator]:
+    table = Table(table_name, MetaData(), autoload_with=engine)
+    schema = pa.schema([(c.name, _arrow_type(pa, c)) for c in table.columns])
+
+    def batches():
+        with engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(
+                select(table).order_by(table.c["_id"])
+            )
+            for chunk in result.partitions(batch_size):
+                # Rows are transposed straight into column arrays; no
+                # per-row dicts are built.
+                columns = list(zip(*chunk))
+                yield pa.RecordBatch.from_arrays(
+                    [pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+                    schema=schema
+                )
+
+    return schema, batches()
+
+
+def _nosql_batches(pa, mongo_db: Database, collection_name: str, batch_size: int) -> Tuple[Any, Iterator]:
+    collection = mongo_db[collection_name]
+
+    # First pass: the union of top-level keys and their widened types.
+    types: Dict[str, str] = {}
+    for doc in collection.find({}):
+        for key, value in doc.items():
+            kind = "str" if isinstance(value, ObjectId) else type_name(value)
+            types[key] = widen(types[key], kind) if key in types else kind
+
+    arrow_types = {
+        "bool": pa.bool_(), "int": pa.int64(), "float": pa.float64(),
+    }
+    schema = pa.schema([(key, arrow_types.get(kind, pa.string())) for key, kind in types.items()])
+
+    def cell(value: Any, kind: str) -> Any:
+        if value is None:
+            return None
+        if kind == "nested":
+            return json.dumps(value, default=str)
+        if kind in ("str", "null"):
+            return str(value)
+        if kind == "float":
+            return float(value)
+        if kind == "int":
+            return int(value)
+        return value
+
+    def batches():
+        chunk: List[Dict] = []
+        cursor = collection.find({}).sort("_id", 1).batch_size(batch_size)
+        for doc in cursor:
+            chunk.append(doc)
+            if len(chunk) == batch_size:
+                yield to_batch(chunk)
+                chunk = []
+        if chunk:
+            yield to_batch(chunk)
+
+    def to_batch(chunk: List[Dict]):
+        return pa.RecordBatch.from_arrays(
+            [
+                pa.array([cell(doc.get(key), kind) for doc in chunk], type=field.type)
+                for (key, kind), field in zip(types.items(), schema)
+            ],
+            schema=schema
+        )
+
+    return schema, batches()
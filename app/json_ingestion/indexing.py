@@ -0,0 +1,45 @@
+from typing import List
+from app.json_ingestion.classifier import SchemaProfile
+
+# Never create more than this many indexes automatically per dataset.
+MAX_AUTO_INDEXES = 5
+
+# A column is considered selective enough to index if at least this share
+# of its (non-null) values are distinct.
+MIN_DISTINCT_RATIO = 0.5
+
+# Long text columns make large, rarely useful indexes.
+MAX_INDEXED_LENGTH = 256
+
+KEY_NAMES = {"id", "key", "uuid", "code", "email", "slug", "sku", "username"}
+
+
+def looks_like_key(name: str) -> bool:
+    lowered = name.lower()
+    return lowered in KEY_NAMES or lowered.endswith("_id") or name.endswith("Id")
+
+
+def choose_index_fields(profile: SchemaProfile) -> List[str]:
+    """
+    Picks likely lookup columns from the ingestion schema profile:
+    - key-like names (id, *_id, email, code, ...) with scalar values
+    - highly selective int/str columns (many distinct values, short)
+    Floats, booleans, nested values and sparse columns are skipped.
+    """
+    scored = []
+
+    for name, col in profile.columns.items():
+        if name == "_id" or col.type not in ("int", "str"):
+            continue
+
+        present = col.count - col.nulls
+        if present == 0 or present < profile.rows_seen * 0.9:
+            continue
+        if col.max_length > MAX_INDEXED_LENGTH:
+            continue
+
+        ratio = min(col.distinct.estimate() / present, 1.0)
+        if looks_like_key(name) or ratio >= MIN_DISTINCT_RATIO:
+            scored.append((not looks_like_key(name), -ratio, name))
+
+    return [name for _, _, name in sorted(scored)[:MAX_AUTO_INDEXES]]
@@ -1,84 +1,226 @@
 import json
+from itertools import chain, islice
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator
+from sqlalchemy import text
+from sqlalchemy.exc import StatementError
 from sqlalchemy.orm import Session
-from app.json_ingestion.classifier import is_sql_like
-from app.json_ingestion.sql_engine import store_sql_dataset
-from app.json_ingestion.nosql_engine import store_nosql_dataset
-from app.db import crud, schemas
+from app.config import CLASSIFY_SAMPLE_SIZE
+from app.json_ingestion.classifier import SchemaProfile, profile_json, matches_sql_row
+from app.json_ingestion.sql_engine import store_sql_dataset, create_sql_index
+from app.json_ingestion.nosql_engine import store_nosql_dataset, create_nosql_index
+from app.json_ingestion.indexing import choose_index_fields
+from app.json_ingestion.stream import JsonStreamReader
+from app.json_ingestion.mongo import get_mongo_db
+from app.db import crud, schemas, models
 from fastapi import HTTPException
 
-MONGO_URI = "mongodb://localhost:27017"
-MONGO_DB = "json_ingestion"
+
+class SchemaMismatch(Exception):
+    """
+    A row arriving after classification does not fit the sampled SQL schema.
+    """
 
 
-def ingest_json(db: Session, json_data, original_name: str | None = None):
+def ingest_json(
+    db: Session,
+    json_data,
+    original_name: str | None = None,
+    progress: Callable[[int], None] | None = None,
+    dataset_id: int | None = None
+):
     """
     Safe ingestion pipeline:
-    - Classifies JSON
+    - Classifies JSON (one profiling pass, sampled for large lists)
     - Stores SQL/NoSQL first
     - Only writes metadata AFTER storage succeeds
     - Prevents corrupted datasets forever
+    `progress` is called with the running row count while storing.
+    `dataset_id` is a row already reserved by the caller (an ingestion
+    job); on failure it is left for the caller to clean up.
     """
 
-    sql_like = is_sql_like(json_data)
+    if not isinstance(json_data, list):
+        return _ingest(db, SchemaProfile(), lambda: json_data, original_name, progress, dataset_id)
 
-    temp_table_name = None
-    temp_collection_name = None
+    profile = profile_json(json_data, sample_size=CLASSIFY_SAMPLE_SIZE)
+    return _ingest(db, profile, lambda: iter(json_data), original_name, progress, dataset_id)
 
+
+def ingest_json_stream(
+    db: Session,
+    fp: BinaryIO,
+    original_name: str | None = None,
+    progress: Callable[[int], None] | None = None,
+    dataset_id: int | None = None
+):
+    """
+    Streaming ingestion for uploaded files holding a top-level array or
+    NDJSON. Classifies from the first CLASSIFY_SAMPLE_SIZE elements, then
+    stores in batches, so memory stays proportional to the batch size.
+    """
     try:
-        if sql_like:
-            dataset_rows = json_data
-
-            temp_id = crud.peek_next_json_dataset_id(db)  
-            temp_table_name = f"json_ds_{temp_id}"
-
-            row_count = store_sql_dataset(
-                engine=db.bind,
-                table_name=temp_table_name,
-                rows=dataset_rows
-            )
-            meta = crud.create_json_dataset(
-                db,
-                schemas.JsonDatasetCreate(
-                    storage_type="sql",
-                    sql_table_name=temp_table_name,
-                    original_name=original_name
-                )
-            )
-
-            return {
-                "dataset_id": meta.id,
-                "storage_type": "sql",
-                "rows": row_count
-            }
-
-        else:
-            temp_id = crud.peek_next_json_dataset_id(db)
-            temp_collection_name = f"json_ds_{temp_id}"
-
-            doc_count = store_nosql_dataset(
-                mongo_uri=MONGO_URI,
-                db_name=MONGO_DB,
-                collection_name=temp_collection_name,
-                data=json_data
-            )
-
-            meta = crud.create_json_dataset(
-                db,
-                schemas.JsonDatasetCreate(
-                    storage_type="nosql",
-                    mongo_collection_name=temp_collection_name,
-                    original_name=original_name
-                )
-            )
-
-            return {
-                "dataset_id": meta.id,
-                "storage_type": "nosql",
-                "documents": doc_count
-            }
+        kind, values = JsonStreamReader(fp).open()
+        sample = list(islice(values, CLASSIFY_SAMPLE_SIZE))
+    except ValueError:
+        raise HTTPException(400, "Invalid JSON file")
+
+    # A single top-level object (not an array or NDJSON stream).
+    if kind == "values" and len(sample) == 1:
+        return ingest_json(
+            db, sample[0], original_name=original_name, progress=progress, dataset_id=dataset_id
+        )
+
+    profile = profile_json(sample)
+    if len(sample) == CLASSIFY_SAMPLE_SIZE:
+        profile.sampled = True
+
+    opened = []
+
+    def open_rows() -> Iterator[Any]:
+        # First pass continues from the sample; a second pass (after a
+        # schema mismatch) re-reads the spooled file from the start.
+        if not opened:
+            opened.append(True)
+            return chain(sample, values)
+        fp.seek(0)
+        return JsonStreamReader(fp).open()[1]
+
+    return _ingest(db, profile, open_rows, original_name, progress, dataset_id)
+
+
+def _ingest(
+    db: Session,
+    profile: SchemaProfile,
+    open_rows: Callable[[], Any],
+    original_name: str | None,
+    progress: Callable[[int], None] | None = None,
+    dataset_id: int | None = None
+):
+    """
+    Stores rows as SQL if the profile says so, otherwise in MongoDB.
+    When the profile was built from a sample, every row is checked
+    against the sampled keys and column types while loading; on the
+    first mismatch (or a value the driver rejects) the partial table is
+    dropped and the data goes to MongoDB instead.
+    The metadata row is reserved first and the table/collection is named
+    after its id, so concurrent ingests never collide.
+    """
+    if dataset_id is None:
+        dataset = crud.reserve_json_dataset(db)
+    else:
+        dataset = crud.get_reserved_json_dataset(db, dataset_id)
+        if dataset is None:
+            raise HTTPException(410, "Dataset reservation no longer exists")
+    try:
+        if profile.sql_like:
+            rows = open_rows()
+            if profile.sampled:
+                rows = _checked_rows(rows, {name: col.type for name, col in profile.columns.items()})
+            try:
+                return _ingest_sql(db, dataset, rows, profile, original_name, progress)
+            except SchemaMismatch:
+                pass
+            except StatementError as e:
+                if not isinstance(e.orig, TypeError):
+                    raise
+
+        return _ingest_nosql(db, dataset, open_rows(), profile, original_name, progress)
 
     except Exception as e:
+        db.rollback()
+        if dataset_id is None:
+            crud.release_json_dataset(db, dataset.id)
+        # StatementError text includes the whole parameter batch.
+        reason = e.orig if isinstance(e, StatementError) else e
         raise HTTPException(
             status_code=400,
-            detail=f"Ingestion failed: {str(e)}"
+            detail=f"Ingestion failed: {str(reason)}"
+        )
+
+
+def discard_dataset_data(db: Session, dataset_id: int):
+    """
+    Drops the table and collection a failed or interrupted ingest may
+    have left under the dataset's name.
+    """
+    name = f"json_ds_{dataset_id}"
+    with db.bind.begin() as conn:
+        conn.execute(text(f'DROP TABLE IF EXISTS "{name}"'))
+    get_mongo_db().drop_collection(name)
+
+
+def _checked_rows(rows: Iterable[dict], column_types: Dict[str, str]) -> Iterator[dict]:
+    for row in rows:
+        if not matches_sql_row(row, column_types):
+            raise SchemaMismatch()
+        yield row
+
+
+def _ingest_sql(db: Session, dataset: models.JsonDataset, rows: Iterable[dict], profile: SchemaProfile, original_name: str | None, progress=None):
+    table_name = f"json_ds_{dataset.id}"
+
+    load = store_sql_dataset(
+        engine=db.bind,
+        table_name=table_name,
+        rows=rows,
+        profile=profile,
+        progress=progress
+    )
+
+    index_fields = choose_index_fields(profile)
+    for field in index_fields:
+        create_sql_index(db.bind, table_name, field)
+
+    meta = crud.finalize_json_dataset(
+        db,
+        dataset,
+        schemas.JsonDatasetCreate(
+            storage_type="sql",
+            sql_table_name=table_name,
+            original_name=original_name,
+            indexes=index_fields
         )
+    )
+
+    return {
+        "dataset_id": meta.id,
+        "storage_type": "sql",
+        "rows": load.rows,
+        "rows_per_sec": load.rows_per_sec,
+        "indexes": index_fields,
+        "schema": profile.to_dict()
+    }
+
+
+def _ingest_nosql(db: Session, dataset: models.JsonDataset, data: Any, profile: SchemaProfile, original_name: str | None, progress=None):
+    collection_name = f"json_ds_{dataset.id}"
+
+    mongo_db = get_mongo_db()
+    doc_count = store_nosql_dataset(
+        mongo_db=mongo_db,
+        collection_name=collection_name,
+        data=data,
+        progress=progress
+    )
+
+    index_fields = choose_index_fields(profile)
+    for field in index_fields:
+        create_nosql_index(mongo_db, collection_name, field)
+
+    meta = crud.finalize_json_dataset(
+        db,
+        dataset,
+        schemas.JsonDatasetCreate(
+            storage_type="nosql",
+            mongo_collection_name=collection_name,
+            original_name=original_name,
+            indexes=index_fields
+        )
+    )
+
+    return {
+        "dataset_id": meta.id,
+        "storage_type": "nosql",
+        "documents": doc_count,
+        "indexes": index_fields
+    }
@@ -0,0 +1,114 @@
+import threading
+from typing import Dict
+from pymongo import MongoClient, monitoring
+from pymongo.database import Database
+
+from app.config import MONGO_URI, MONGO_DB, MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """
+    Counts connection pool events so the pool can be sized under load.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.created = 0
+        self.closed = 0
+        self.checked_out = 0
+        self.checked_in = 0
+        self.checkout_failed = 0
+        self.in_use = 0
+        self.peak_in_use = 0
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "max_pool_size": MONGO_MAX_POOL_SIZE,
+                "min_pool_size": MONGO_MIN_POOL_SIZE,
+                "open_connections": self.created - self.closed,
+                "in_use": self.in_use,
+                "peak_in_use": self.peak_in_use,
+                "connections_created": self.created,
+                "connections_closed": self.closed,
+                "checkouts": self.checked_out,
+                "checkins": self.checked_in,
+                "checkout_failures": self.checkout_failed,
+            }
+
+    def connection_created(self, event):
+        with self._lock:
+            self.created += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.closed += 1
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.checked_out += 1
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_in += 1
+            self.in_use -= 1
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failed += 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+
+pool_metrics = PoolMetrics()
+
+_client: MongoClient | None = None
+_client_lock = threading.Lock()
+
+
+def get_mongo_client() -> MongoClient:
+    """
+    Returns the application-wide MongoClient, creating it on first use.
+    MongoClient is thread-safe and pools connections internally.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = MongoClient(
+                    MONGO_URI,
+                    maxPoolSize=MONGO_MAX_POOL_SIZE,
+                    minPoolSize=MONGO_MIN_POOL_SIZE,
+                    event_listeners=[pool_metrics],
+                )
+    return _client
+
+
+def get_mongo_db() -> Database:
+    return get_mongo_client()[MONGO_DB]
+
+
+def close_mongo_client():
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
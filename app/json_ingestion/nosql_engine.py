@@ -1,19 +1,57 @@
-from pymongo import MongoClient
-from typing import Any, List, Dict
+from pymongo.database import Database
+from typing import Any, Callable, List, Dict
+from app.config import NOSQL_INSERT_BATCH_SIZE
+from app.metrics import timed
+from app.json_ingestion.stream import iter_batches
 
-def store_nosql_dataset(mongo_uri: str, db_name: str, collection_name: str, data: Any) -> int:
+@timed("store_nosql_dataset")
+def store_nosql_dataset(
+    mongo_db: Database,
+    collection_name: str,
+    data: Any,
+    batch_size: int = NOSQL_INSERT_BATCH_SIZE,
+    progress: Callable[[int], None] | None = None
+) -> int:
     """
     Stores JSON data in MongoDB.
+    A dict is stored as one document; a list or iterator of documents is
+    inserted in batches of `batch_size`. On failure the collection is
+    dropped so no partial dataset is left behind. `progress`, if given,
+    is called with the running document count after each batch.
     Returns number of inserted documents.
     """
 
-    client = MongoClient(mongo_uri)
-    db = client[db_name]
-    collection = db[collection_name]
+    collection = mongo_db[collection_name]
 
-    if isinstance(data, list):
-        result = collection.insert_many(data)
-        return len(result.inserted_ids)
+    if isinstance(data, dict):
+        collection.insert_one(data)
+        return 1
 
-    result = collection.insert_one(data)
-    return 1
+    count = 0
+    try:
+        for batch in iter_batches(data, batch_size):
+            result = collection.insert_many(batch, ordered=False)
+            count += len(result.inserted_ids)
+            if progress:
+                progress(count)
+    except BaseException:
+        mongo_db.drop_collection(collection_name)
+        raise
+
+    return count
+
+
+def create_nosql_index(mongo_db: Database, collection_name: str, field: str) -> str:
+    """
+    Creates an ascending index on one field of a dataset collection.
+    Returns the index name.
+    """
+    if not field or field.startswith("$"):
+        raise ValueError(f"Invalid field '{field}'")
+    return mongo_db[collection_name].create_index(field)
+
+
+def drop_nosql_index(mongo_db: Database, collection_name: str, field: str):
+    index_name = f"{field}_1"
+    if index_name in mongo_db[collection_name].index_information():
+        mongo_db[collection_name].drop_index(index_name)
@@ -0,0 +1,155 @@
+import json
+import re
+from typing import Any, Dict, List, NamedTuple, Tuple
+
+# Supported predicate operators: "field:op:value" in the query string.
+OPERATORS = {"eq", "ne", "gt", "gte", "lt", "lte", "in", "prefix"}
+
+SQL_COMPARISONS = {"eq": "=", "ne": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+MONGO_COMPARISONS = {"eq": "$eq", "ne": "$ne", "gt": "$gt", "gte": "$gte", "lt": "$lt", "lte": "$lte"}
+
+# Highest code point; "prefix" becomes a half-open range [v, v + MAX_CHAR)
+# so SQL can answer it from an index.
+MAX_CHAR = "\U0010ffff"
+
+
+class Predicate(NamedTuple):
+    field: str
+    op: str
+    value: Any
+
+
+def parse_value(raw: str) -> Any:
+    """
+    Query-string values are decoded as JSON when possible, so `18`,
+    `1.5`, `true` and `null` keep their type (needed for Mongo matching);
+    anything else is taken as a plain string.
+    """
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return raw
+
+
+def parse_fields(raw: str | None) -> List[str] | None:
+    if not raw:
+        return None
+    fields = [f.strip() for f in raw.split(",") if f.strip()]
+    return fields or None
+
+
+def parse_filters(raw_filters: List[str] | None) -> List[Predicate]:
+    """
+    Parses `field:op:value` strings. For `in`, value is comma-separated.
+    Raises ValueError on malformed input.
+    """
+    predicates = []
+
+    for raw in raw_filters or []:
+        parts = raw.split(":", 2)
+        if len(parts) != 3 or not parts[0]:
+            raise ValueError(f"Invalid filter '{raw}', expected field:op:value")
+
+        field, op, value = parts
+        if op not in OPERATORS:
+            raise ValueError(f"Unsupported filter operator '{op}'")
+
+        if op == "in":
+            parsed = [parse_value(v) for v in value.split(",")]
+        elif op == "prefix":
+            parsed = value
+        else:
+            parsed = parse_value(value)
+
+        predicates.append(Predicate(field, op, parsed))
+
+    return predicates
+
+
+def compile_sql(
+    table_name: str,
+    columns: List[str],
+    fields: List[str] | None = None,
+    predicates: List[Predicate] | None = None,
+    after_id: int | None = None,
+    limit: int | None = None,
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    Builds a parameterized SELECT for a dataset table. Field names are
+    checked against the table's `columns` before being quoted into SQL;
+    all values are bound parameters. `_id` is always selected so callers
+    can page by it.
+    """
+    for name in (fields or []) + [p.field for p in predicates or []]:
+        if name not in columns:
+            raise ValueError(f"Unknown field '{name}'")
+
+    if fields:
+        selected = ["_id"] + [f for f in fields if f != "_id"]
+        select_list = ", ".join(f'"{f}"' for f in selected)
+    else:
+        select_list = "*"
+
+    clauses = []
+    params: Dict[str, Any] = {}
+
+    for i, p in enumerate(predicates or []):
+        col = f'"{p.field}"'
+        key = f"p{i}"
+
+        if p.op in SQL_COMPARISONS:
+            if p.value is None and p.op in ("eq", "ne"):
+                clauses.append(f"{col} IS {'NOT ' if p.op == 'ne' else ''}NULL")
+                continue
+            clauses.append(f"{col} {SQL_COMPARISONS[p.op]} :{key}")
+            params[key] = p.value
+        elif p.op == "in":
+            keys = [f"{key}_{j}" for j in range(len(p.value))]
+            clauses.append(f"{col} IN ({', '.join(':' + k for k in keys)})")
+            params.update(zip(keys, p.value))
+        elif p.op == "prefix":
+            clauses.append(f"{col} >= :{key}_lo AND {col} < :{key}_hi")
+            params[f"{key}_lo"] = p.value
+            params[f"{key}_hi"] = p.value + MAX_CHAR
+
+    if after_id is not None:
+        clauses.append('"_id" > :after_id')
+        params["after_id"] = after_id
+
+    sql = f'SELECT {select_list} FROM "{table_name}"'
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += ' ORDER BY "_id"'
+    if limit is not None:
+        sql += " LIMIT :limit"
+        params["limit"] = limit
+
+    return sql, params
+
+
+def compile_mongo(
+    fields: List[str] | None = None,
+    predicates: List[Predicate] | None = None,
+) -> Tuple[Dict[str, Any], Dict[str, int] | None]:
+    """
+    Builds a Mongo (filter, projection) pair. Projection is None when all
+    fields are requested.
+    """
+    for name in (fields or []) + [p.field for p in predicates or []]:
+        if name.startswith("$"):
+            raise ValueError(f"Invalid field '{name}'")
+
+    query: Dict[str, Any] = {}
+
+    for p in predicates or []:
+        cond = query.setdefault(p.field, {})
+        if p.op in MONGO_COMPARISONS:
+            cond[MONGO_COMPARISONS[p.op]] = p.value
+        elif p.op == "in":
+            cond["$in"] = p.value
+        elif p.op == "prefix":
+            cond["$regex"] = "^" + re.escape(p.value)
+
+    projection = {f: 1 for f in fields} if fields else None
+
+    return query, projection
@@ -1,19 +1,44 @@
-from sqlalchemy import text
+from sqlalchemy import text, inspect
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Session
-from pymongo import MongoClient
-from typing import Any, List, Dict
+from pymongo.database import Database
+from bson import ObjectId
+from typing import Any, List, Dict, Iterator
+from app.json_ingestion.query import Predicate, compile_sql, compile_mongo
+from app.metrics import timed
 
+# Rows fetched per round-trip when streaming a dataset.
+STREAM_BATCH_SIZE = 1000
 
-MONGO_URI = "mongodb://localhost:27017"
-MONGO_DB = "json_ingestion"
 
+def get_sql_columns(bind: Engine, table_name: str) -> List[str]:
+    return [c["name"] for c in inspect(bind).get_columns(table_name)]
 
-def retrieve_sql_dataset(db: Session, table_name: str) -> List[Dict]:
+
+@timed("retrieve_sql_dataset")
+def retrieve_sql_dataset(
+    db: Session,
+    table_name: str,
+    after_id: int | None = None,
+    limit: int | None = None,
+    fields: List[str] | None = None,
+    predicates: List[Predicate] | None = None
+) -> List[Dict]:
     """
-    Fetches all rows from a SQL dataset table and returns list of dicts.
+    Fetches rows from a SQL dataset table and returns list of dicts.
+    With `limit`, returns one keyset page ordered by `_id`, starting
+    after `after_id`. `fields` and `predicates` are pushed down into
+    the SELECT list and WHERE clause.
     """
-    query = text(f"SELECT * FROM {table_name}")
-    result = db.execute(query)
+    sql, params = compile_sql(
+        table_name,
+        get_sql_columns(db.bind, table_name),
+        fields=fields,
+        predicates=predicates,
+        after_id=after_id,
+        limit=limit
+    )
+    result = db.execute(text(sql), params)
 
     rows = result.fetchall()
     columns = result.keys()
@@ -21,13 +46,108 @@ def retrieve_sql_dataset(db: Session, table_name: str) -> List[Dict]:
     return [dict(zip(columns, row)) for row in rows]
 
 
-def retrieve_nosql_dataset(collection_name: str) -> List[Dict]:
+@timed("iter_sql_dataset")
+def iter_sql_dataset(
+    engine: Engine,
+    table_name: str,
+    after_id: int | None = None,
+    fields: List[str] | None = None,
+    predicates: List[Predicate] | None = None,
+    batch_size: int = STREAM_BATCH_SIZE
+) -> Iterator[Dict]:
+    """
+    Returns an iterator over the rows of a SQL dataset in `_id` order,
+    holding at most `batch_size` rows in memory. The query is compiled
+    (and validated) eagerly; rows are read lazily on their own connection
+    so the iterator can outlive the request session.
+    """
+    sql, params = compile_sql(
+        table_name,
+        get_sql_columns(engine, table_name),
+        fields=fields,
+        predicates=predicates,
+        after_id=after_id
+    )
+    return _stream_sql(engine, sql, params, batch_size)
+
+
+def _stream_sql(engine: Engine, sql: str, params: Dict[str, Any], batch_size: int) -> Iterator[Dict]:
+    with engine.connect() as conn:
+        result = conn.execution_options(
+            stream_results=True, yield_per=batch_size
+        ).execute(text(sql), params)
+        columns = list(result.keys())
+
+        for row in result:
+            yield dict(zip(columns, row))
+
+
+@timed("retrieve_nosql_dataset")
+def retrieve_nosql_dataset(
+    mongo_db: Database,
+    collection_name: str,
+    after_id: ObjectId | None = None,
+    limit: int | None = None,
+    fields: List[str] | None = None,
+    predicates: List[Predicate] | None = None
+) -> List[Dict]:
+    """
+    Fetches documents from MongoDB collection and returns list of dicts,
+    ordered by `_id` and starting after `after_id`. With `limit`, returns
+    one keyset page with `_id` included (as a hex string). `fields` and `predicates` become
+    the Mongo projection and filter.
+    """
+    collection = mongo_db[collection_name]
+    query, projection = compile_mongo(fields, predicates)
+
+    _apply_after_id(query, after_id)
+
+    if limit is None:
+        projection = dict(projection or {}, _id=0)
+        docs = list(collection.find(query, projection).sort("_id", 1))
+        return docs
+
+    cursor = collection.find(query, projection).sort("_id", 1).limit(limit)
+
+    return [_stringify_id(doc) for doc in cursor]
+
+
+@timed("iter_nosql_dataset")
+def iter_nosql_dataset(
+    mongo_db: Database,
+    collection_name: str,
+    after_id: ObjectId | None = None,
+    fields: List[str] | None = None,
+    predicates: List[Predicate] | None = None,
+    batch_size: int = STREAM_BATCH_SIZE
+) -> Iterator[Dict]:
     """
-    Fetches all documents from MongoDB collection and returns list of dicts.
+    Returns an iterator over the documents of a MongoDB collection in
+    `_id` order, read from a server-side cursor `batch_size` documents
+    per round-trip.
     """
-    client = MongoClient(MONGO_URI)
-    db = client[MONGO_DB]
-    collection = db[collection_name]
+    collection = mongo_db[collection_name]
+    query, projection = compile_mongo(fields, predicates)
+
+    _apply_after_id(query, after_id)
+    cursor = collection.find(query, projection).sort("_id", 1).batch_size(batch_size)
+    return _stream_cursor(cursor)
+
+
+def _stream_cursor(cursor) -> Iterator[Dict]:
+    try:
+        for doc in cursor:
+            yield _stringify_id(doc)
+    finally:
+        cursor.close()
+
+
+def _apply_after_id(query: Dict[str, Any], after_id: ObjectId | None):
+    if after_id:
+        query.setdefault("_id", {})["$gt"] = after_id
+
 
-    docs = list(collection.find({}, {"_id": 0})) 
-    return docs
+def _stringify_id(doc: Dict[str, Any]) -> Dict[str, Any]:
+    if isinstance(doc.get("_id"), ObjectId):
+        doc["_id"] = str(doc["_id"])
+    return doc
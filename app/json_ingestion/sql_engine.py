@@ -1,33 +1,72 @@
-from sqlalchemy import Table, Column, MetaData, String, Integer, Float, Boolean
+import re
+import time
+from sqlalchemy import Table, Column, MetaData, String, Integer, Float, Boolean, inspect, text
 from sqlalchemy.sql import insert
-from sqlalchemy.engine import Engine
-from typing import List, Dict, Tuple
+from sqlalchemy.engine import Engine, Connection
+from itertools import chain
+from typing import Any, Callable, Iterable, List, Dict, NamedTuple, Tuple
+from app.config import SQL_INSERT_BATCH_SIZE
+from app.metrics import timed
+from app.json_ingestion.stream import iter_batches
+from app.json_ingestion.classifier import SchemaProfile, profile_json
 
-def infer_sql_type(value):
-    if isinstance(value, bool):
-        return Boolean
-    if isinstance(value, int):
-        return Integer
-    if isinstance(value, float):
-        return Float
-        return String
-    return String
+SQL_TYPES = {
+    "bool": Boolean,
+    "int": Integer,
+    "float": Float,
+    "str": String,
+    "null": String,
+}
 
 
-def store_sql_dataset(engine: Engine, table_name: str, rows: List[Dict]) -> int:
+class LoadStats(NamedTuple):
+    rows: int
+    seconds: float
+    rows_per_sec: float
+
+
+# Applied to the loading connection only, then restored. WAL is a
+# persistent database setting and is left on.
+BULK_LOAD_PRAGMAS = {
+    "synchronous": "NORMAL",
+    "cache_size": "-65536",   # 64 MiB
+}
+
+
+@timed("store_sql_dataset")
+def store_sql_dataset(
+    engine: Engine,
+    table_name: str,
+    rows: Iterable[Dict],
+    profile: SchemaProfile | None = None,
+    batch_size: int = SQL_INSERT_BATCH_SIZE,
+    progress: Callable[[int], None] | None = None
+) -> LoadStats:
     """
-    Creates a new SQL table and inserts all rows.
-    Returns number of inserted rows.
+    Creates a new SQL table and inserts all rows in batches of
+    `batch_size` inside a single transaction. `rows` may be a list or
+    any iterator. Column types and nullability come from `profile`
+    (widened across all profiled rows), or from the first row if no
+    profile is given.
+    If anything fails the transaction is rolled back and the table dropped.
+    `progress`, if given, is called with the running row count after
+    each batch. Returns row count and load throughput.
     """
 
     metadata = MetaData()
 
-    sample = rows[0]
+    rows = iter(rows)
+    sample = next(rows)
+    if profile is None:
+        profile = profile_json([sample])
+
     columns = []
 
-    for key, value in sample.items():
-        col_type = infer_sql_type(value)
-        columns.append(Column(key, col_type))
+    for key, col in profile.columns.items():
+        col_type = SQL_TYPES.get(col.type, String)
+        # A sampled profile may not have seen every null.
+        nullable = col.nullable or profile.sampled
+        columns.append(Column(key, col_type, nullable=nullable))
 
     table = Table(
         table_name,
@@ -36,9 +75,79 @@ def store_sql_dataset(engine: Engine, table_name: str, rows: List[Dict]) -> int:
         *columns,
     )
 
-    metadata.create_all(engine)
+    started = time.perf_counter()
+    row_count = 0
 
     with engine.connect() as conn:
-        conn.execute(insert(table), rows)
+        previous = _apply_bulk_pragmas(conn)
+        try:
+            with conn.begin():
+                table.create(conn)
+                stmt = insert(table)
+                for batch in iter_batches(chain([sample], rows), batch_size):
+                    conn.execute(stmt, batch)
+                    row_count += len(batch)
+                    if progress:
+                        progress(row_count)
+        except BaseException:
+            table.drop(conn, checkfirst=True)
+            conn.commit()
+            raise
+        finally:
+            _restore_pragmas(conn, previous)
+
+    seconds = time.perf_counter() - started
+    return LoadStats(
+        rows=row_count,
+        seconds=round(seconds, 4),
+        rows_per_sec=round(row_count / seconds, 1) if seconds > 0 else float(row_count)
+    )
+
+
+def _apply_bulk_pragmas(conn: Connection) -> Dict[str, Any]:
+    if conn.dialect.name != "sqlite":
+        return {}
+
+    # Switching modes needs an exclusive lock, so concurrent loads would
+    # fail with "database is locked"; only switch if not already WAL.
+    if conn.exec_driver_sql("PRAGMA journal_mode").scalar().lower() != "wal":
+        conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+
+    previous = {}
+    for name, value in BULK_LOAD_PRAGMAS.items():
+        previous[name] = conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+        conn.exec_driver_sql(f"PRAGMA {name}={value}")
+    conn.commit()
+    return previous
+
+
+def _restore_pragmas(conn: Connection, previous: Dict[str, Any]):
+    for name, value in previous.items():
+        conn.exec_driver_sql(f"PRAGMA {name}={value}")
+    if previous:
+        conn.commit()
+
+
+def sql_index_name(table_name: str, column: str) -> str:
+    return "ix_" + re.sub(r"\W", "_", f"{table_name}_{column}")
+
+
+def create_sql_index(engine: Engine, table_name: str, column: str) -> str:
+    """
+    Creates a secondary index on one column of a dataset table.
+    Returns the index name.
+    """
+    columns = [c["name"] for c in inspect(engine).get_columns(table_name)]
+    if column not in columns:
+        raise ValueError(f"Unknown field '{column}'")
+
+    name = sql_index_name(table_name, column)
+    with engine.begin() as conn:
+        conn.execute(text(f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table_name}" ("{column}")'))
+    return name
+
 
-    return len(rows)
+def drop_sql_index(engine: Engine, table_name: str, column: str):
+    name = sql_index_name(table_name, column)
+    with engine.begin() as conn:
+        conn.execute(text(f'DROP INDEX IF EXISTS "{name}"'))
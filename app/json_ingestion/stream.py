@@ -0,0 +1,151 @@
+import codecs
+import json
+import re
+from itertools import islice
+from typing import Any, BinaryIO, Iterable, Iterator, List, Tuple
+from app.config import JSON_STREAM_CHUNK_SIZE, MAX_JSON_ELEMENT_SIZE
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\r\n"
+# Characters that end a literal, number or escape sequence.
+_TOKEN_END = re.compile(r'[\s,:\[\]{}"]')
+
+
+class JsonStreamReader:
+    """
+    Incremental reader over a binary file containing either one top-level
+    JSON array or a sequence of JSON values (NDJSON / concatenated JSON).
+    Only the current chunk and the element being decoded are held in
+    memory; an element longer than `max_element_size` characters is
+    rejected.
+    """
+
+    def __init__(
+        self,
+        fp: BinaryIO,
+        chunk_size: int = JSON_STREAM_CHUNK_SIZE,
+        max_element_size: int = MAX_JSON_ELEMENT_SIZE
+    ):
+        self._fp = fp
+        self._chunk_size = chunk_size
+        self._max_element_size = max_element_size
+        self._utf8 = codecs.getincrementaldecoder("utf-8-sig")()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self) -> bool:
+        """
+        Appends the next chunk to the buffer. Returns False at end of file.
+        """
+        if self._eof:
+            return False
+
+        raw = self._fp.read(self._chunk_size)
+        if not raw:
+            self._eof = True
+            self._buf = self._buf[self._pos:] + self._utf8.decode(b"", final=True)
+            self._pos = 0
+            return False
+
+        self._buf = self._buf[self._pos:] + self._utf8.decode(raw)
+        self._pos = 0
+        return True
+
+    def _peek(self) -> str:
+        """
+        Skips whitespace and returns the next character ("" at EOF).
+        """
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ""
+
+    def _decode_value(self) -> Any:
+        self._peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError as e:
+                # Only an element cut off by the buffer edge can become
+                # valid with more input; anything else is malformed.
+                if self._truncated(e) and self._fill_element():
+                    continue
+                raise
+
+            # A value whose token runs to the buffer edge may be truncated
+            # (12 out of 1234, or 1.5 out of 1.5e-3, where the decoder stops
+            # before a dangling "e"), so read on before accepting it.
+            if (
+                not self._eof
+                and _TOKEN_END.search(self._buf, end) is None
+                and self._fill_element()
+            ):
+                continue
+
+            self._pos = end
+            return value
+
+    def _truncated(self, e: json.JSONDecodeError) -> bool:
+        if e.msg.startswith("Unterminated string"):
+            # Raised only when the input ends inside the string.
+            return True
+        # Otherwise the error is at the last, partial token (e.g. "tru",
+        # "-2." or "\\u00") or at the very end of the buffer.
+        return _TOKEN_END.search(self._buf, e.pos) is None
+
+    def _fill_element(self) -> bool:
+        if len(self._buf) - self._pos >= self._max_element_size:
+            raise ValueError(
+                f"JSON element exceeds {self._max_element_size} characters"
+            )
+        return self._fill()
+
+    def open(self) -> Tuple[str, Iterator[Any]]:
+        """
+        Returns ("array", elements) for a top-level array, or
+        ("values", values) for one or more top-level values.
+        """
+        first = self._peek()
+        if first == "":
+            raise ValueError("Empty JSON input")
+
+        if first == "[":
+            self._pos += 1
+            return "array", self._iter_array()
+
+        return "values", self._iter_values()
+
+    def _iter_array(self) -> Iterator[Any]:
+        if self._peek() == "]":
+            self._pos += 1
+            return
+
+        while True:
+            yield self._decode_value()
+
+            sep = self._peek()
+            self._pos += 1
+            if sep == "]":
+                break
+            if sep != ",":
+                raise ValueError("Malformed JSON array: expected ',' or ']'")
+
+        if self._peek() != "":
+            raise ValueError("Unexpected data after top-level JSON array")
+
+    def _iter_values(self) -> Iterator[Any]:
+        while self._peek() != "":
+            yield self._decode_value()
+
+
+def iter_batches(items: Iterable[Any], batch_size: int) -> Iterator[List[Any]]:
+    it = iter(items)
+    while True:
+        batch = list(islice(it, batch_size))
+        if not batch:
+            return
+        yield batch
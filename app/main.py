@@ -1,61 +1,96 @@
-import subprocess
-import sys
-import pkgutil
-import os
+import logging
+import time
 
-ROOT_DIR = os.path.dirname(os.path.dirname(__file__))
-REQ_PATH = os.path.join(ROOT_DIR, "requirements.txt")
-
-def auto_install_requirements():
-    if not os.path.exists(REQ_PATH):
-        print("⚠️ requirements.txt not found. Skipping auto-install.")
-        return
-
-    print("🔍 Checking required packages...")
-    missing = []
-
-    with open(REQ_PATH, "r") as f:
-        for line in f:
-            pkg = line.strip()
-            if not pkg or pkg.startswith("#"):
-                continue
-
-            module_name = pkg.split("[")[0].replace("-", "_")
-
-            if not pkgutil.find_loader(module_name):
-                missing.append(pkg)
-
-    if missing:
-        print(f"📦 Installing missing packages: {missing}")
-        try:
-            subprocess.check_call([sys.executable, "-m", "pip", "install"] + missing)
-            print("✅ Dependencies installed successfully!")
-        except Exception as e:
-            print("❌ Installation error:", e)
-    else:
-        print("✅ All dependencies already installed!")
-
-auto_install_requirements()
+_import_started = time.perf_counter()
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, UploadFile, File, Depends
-from minio import Minio
+from .uploads import store_upload, store_upload_batch
+from .config import MAX_BATCH_FILES, PRESIGNED_URL_EXPIRY_SECONDS, PRESIGNED_UPLOAD_EXPIRY_SECONDS
+from .config import MINIO_BUCKET, STARTUP_BUDGET_SECONDS
+from .storage import get_minio_client, ensure_bucket
 from .utils import get_file_path
-from io import BytesIO
+from .url_cache import presigned_urls, forget_file, url_key
+from .result_cache import dataset_results
+from .thumbnails import schedule_thumbnail, wants_thumbnail
+from .categorizer import feature_index
+from .file_tree import tree_cache, file_info
+from .concurrency import run_db, run_storage, storage_pool, db_pool, shutdown_pools
+from .jobs import ingest_jobs, save_upload, JobQueueFull
+from .metrics import MetricsMiddleware, render_metrics
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from sqlalchemy.orm import Session
-from .db.database import Base, engine, SessionLocal
+from pymongo.database import Database
+from bson import ObjectId
+from .db.database import Base, engine, SessionLocal, add_missing_columns, enable_wal
 from .db import crud, schemas, models
-from typing import List
+from .db.search import ensure_search_indexes
+from typing import Any, Dict, List
 from .db.schemas import FileMetadataResponse
-from datetime import timedelta
+from datetime import datetime, timedelta
 from fastapi import HTTPException
 from fastapi import Query
 from fastapi import Body
-from app.json_ingestion.manager import ingest_json
-from app.json_ingestion.retrieval import retrieve_sql_dataset, retrieve_nosql_dataset
+from app.json_ingestion.retrieval import (
+    retrieve_sql_dataset, retrieve_nosql_dataset, iter_sql_dataset, iter_nosql_dataset
+)
+from app.json_ingestion.query import parse_fields, parse_filters
+from app.json_ingestion.sql_engine import create_sql_index, drop_sql_index
+from app.json_ingestion.nosql_engine import create_nosql_index, drop_nosql_index
+from app.json_ingestion.export import (
+    export_dataset, export_object_name, export_object_names, ExportUnavailable, EXPORT_FORMATS
+)
+from app.json_ingestion.mongo import get_mongo_db, close_mongo_client, pool_metrics
 import json
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
+
+startup_timings: Dict[str, float] = {}
+
+
+def prepare_database():
+    """
+    Creates missing tables, columns and search indexes, builds the
+    folder stats on first run and sweeps abandoned direct uploads.
+    """
+    enable_wal(engine)
+    Base.metadata.create_all(bind=engine)
+    add_missing_columns(engine)
+    ensure_search_indexes(engine)
+
+    with SessionLocal() as db:
+        if crud.get_folder_stats(db, "") is None:
+            crud.rebuild_folder_stats(db)
+        sweep_expired_uploads(db, datetime.utcnow())
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    await run_db(prepare_database)
+    # The bucket check runs in the background: a MinIO outage must not
+    # delay or fail startup, and uploads retry it (see require_bucket).
+    storage_pool.submit(ensure_bucket, BUCKET)
+    # Cleaning up after jobs a previous run left unfinished may wait on
+    # MongoDB, so it runs in the background too.
+    db_pool.submit(ingest_jobs.recover)
+    startup_timings["startup_seconds"] = round(time.perf_counter() - started, 4)
+
+    cold_start = startup_timings["import_seconds"] + startup_timings["startup_seconds"]
+    if cold_start > STARTUP_BUDGET_SECONDS:
+        logger.warning(
+            "Cold start took %.2fs (budget %.2fs): %s", cold_start, STARTUP_BUDGET_SECONDS, startup_timings
+        )
+
+    yield
+
+    shutdown_pools()
+    ingest_jobs.shutdown()
+    close_mongo_client()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -63,9 +98,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Before-Id", "X-Total-Count", "Server-Timing", "X-Cache"],
 )
-
-Base.metadata.create_all(bind=engine)
+app.add_middleware(MetricsMiddleware)
 
 def get_db():
     try:
@@ -79,152 +114,385 @@ def get_db():
     finally:
         db.close()
 
-minio_client = Minio(
-    "localhost:9000",
-    access_key="minioadmin",
-    secret_key="minioadmin",
-    secure=False
-)
+BUCKET = MINIO_BUCKET
 
-BUCKET = "files"
+# Uploads with these extensions are ingested as JSON datasets.
+JSON_EXTENSIONS = (".json", ".ndjson", ".jsonl")
 
-if not minio_client.bucket_exists(BUCKET):
-    minio_client.make_bucket(BUCKET)
+def require_bucket():
+    if not ensure_bucket(BUCKET):
+        raise HTTPException(503, "Object storage is unavailable")
 
-@app.post("/upload")
+@app.post("/upload", dependencies=[Depends(require_bucket)])
 async def upload(file: UploadFile = File(...), db: Session = Depends(get_db)):
     filename = file.filename.lower()
-    if filename.endswith(".json"):
-        content = await file.read()
+    if filename.endswith(JSON_EXTENSIONS):
+        # Ingested in the background like /json/file; the client polls
+        # /jobs/{job_id} instead of holding the connection.
+        return JSONResponse(await queue_json_file(file), status_code=202)
+    
+    saved, deduplicated = await store_upload(
+        db, get_minio_client(), BUCKET, file.file, file.filename, file.content_type
+    )
+    tree_cache.add(saved)
+    schedule_thumbnail(get_minio_client(), BUCKET, saved)
 
+    return {
+        "status": "success",
+        "stored_as": saved.stored_path,
+        "id": saved.id,
+        "deduplicated": deduplicated,
+    }
+
+
+@app.post("/upload/batch", dependencies=[Depends(require_bucket)])
+async def upload_batch(files: List[UploadFile] = File(...), db: Session = Depends(get_db)):
+    """
+    Uploads many files in one multipart request. Media/documents are
+    written to MinIO concurrently and their metadata committed in one
+    transaction; JSON files are queued as ingestion jobs.
+    Returns a result per file, in request order.
+    """
+    if len(files) > MAX_BATCH_FILES:
+        raise HTTPException(400, f"At most {MAX_BATCH_FILES} files per batch")
+
+    json_files = [f for f in files if f.filename.lower().endswith(JSON_EXTENSIONS)]
+    other_files = [f for f in files if not f.filename.lower().endswith(JSON_EXTENSIONS)]
+
+    results = {}
+
+    if other_files:
+        stored, saved = await store_upload_batch(db, get_minio_client(), BUCKET, other_files)
+        for meta in saved:
+            tree_cache.add(meta)
+            schedule_thumbnail(get_minio_client(), BUCKET, meta)
+        results.update(zip(map(id, other_files), stored))
+
+    for f in json_files:
         try:
-            parsed_json = json.loads(content)
-        except Exception:
-            raise HTTPException(400, "Invalid JSON file")
+            queued = await queue_json_file(f)
+            results[id(f)] = {"filename": f.filename, **queued}
+        except HTTPException as e:
+            results[id(f)] = {"filename": f.filename, "status": "error", "detail": e.detail}
 
-        return ingest_json(db, parsed_json, original_name=file.filename)
-    
-    content = await file.read()
-    object_path = get_file_path(file.filename)
+    return {"results": [results[id(f)] for f in files]}
 
-    stream = BytesIO(content)                   
 
-    minio_client.put_object(
-        bucket_name=BUCKET,
+@app.post("/upload/presign", dependencies=[Depends(require_bucket)])
+def presign_upload(
+    filename: str = Body(..., embed=True),
+    content_type: str | None = Body(default=None, embed=True),
+    db: Session = Depends(get_db)
+):
+    """
+    Step 1 of a direct upload: reserves a storage path and returns a
+    presigned PUT URL. The client PUTs the bytes straight to MinIO, then
+    calls /upload/complete with the returned upload_id.
+    """
+    if filename.lower().endswith(JSON_EXTENSIONS):
+        raise HTTPException(400, "JSON files must be uploaded through /upload or /json/file")
+
+    now = datetime.utcnow()
+    sweep_expired_uploads(db, now)
+
+    object_path = get_file_path(filename)
+    expires = timedelta(seconds=PRESIGNED_UPLOAD_EXPIRY_SECONDS)
+
+    try:
+        url = get_minio_client().presigned_put_object(BUCKET, object_path, expires=expires)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error generating upload URL: {str(e)}")
+
+    pending = crud.create_pending_upload(
+        db,
         object_name=object_path,
-        data=stream,
-        length=len(content),
-        content_type=file.content_type
+        original_name=filename,
+        mime_type=content_type or "application/octet-stream",
+        expires_at=now + expires
     )
 
+    return {
+        "upload_id": pending.id,
+        "url": url,
+        "method": "PUT",
+        "stored_as": object_path,
+        "expires_at": pending.expires_at.isoformat()
+    }
+
+def sweep_expired_uploads(db: Session, now: datetime):
+    """
+    Drops reservations whose upload window closed one full expiry ago
+    (a PUT signed just before expiry may still be streaming) and removes,
+    in the background, whatever objects were PUT for them.
+    """
+    grace = timedelta(seconds=PRESIGNED_UPLOAD_EXPIRY_SECONDS)
+    orphans = crud.delete_expired_pending_uploads(db, now - grace)
+    if orphans:
+        storage_pool.submit(remove_orphaned_uploads, orphans)
+
+
+def remove_orphaned_uploads(object_names: List[str]):
+    client = get_minio_client()
+    for name in object_names:
+        try:
+            client.remove_object(BUCKET, name)
+        except Exception as e:
+            logger.warning("Could not remove abandoned upload %s: %s", name, e)
+
+
+@app.post("/upload/complete")
+def complete_upload(upload_id: int = Body(..., embed=True), db: Session = Depends(get_db)):
+    """
+    Step 2 of a direct upload: checks the object exists in MinIO and
+    records its metadata.
+    """
+    pending = crud.get_pending_upload(db, upload_id)
+    if not pending:
+        raise HTTPException(404, "Upload reservation not found")
+    if pending.expires_at < datetime.utcnow():
+        raise HTTPException(410, "Upload reservation expired")
+
+    try:
+        stat = get_minio_client().stat_object(BUCKET, pending.object_name)
+    except Exception:
+        raise HTTPException(409, "Object has not been uploaded yet")
+
     metadata = schemas.FileMetadataCreate(
-        original_name=file.filename,
-        stored_path=object_path,
-        mime_type=file.content_type,
-        size_bytes=len(content)
+        original_name=pending.original_name,
+        stored_path=pending.object_name,
+        mime_type=pending.mime_type,
+        size_bytes=stat.size
     )
-    saved = crud.save_file_metadata(db, metadata)
+    saved = crud.complete_pending_upload(db, pending, metadata)
+    if saved is None:
+        raise HTTPException(409, "Upload was already completed")
+    tree_cache.add(saved)
+    schedule_thumbnail(get_minio_client(), BUCKET, saved)
 
     return {
         "status": "success",
-        "stored_as": object_path,
+        "stored_as": saved.stored_path,
         "id": saved.id,
+        "deduplicated": False,
     }
 
 
-@app.get("/files", response_model=List[FileMetadataResponse])
-def list_files(db: Session = Depends(get_db)):
-    return crud.get_all_files(db)
-
-from typing import Any, Dict, List
-from datetime import datetime
+FILE_LIST_FIELDS = [
+    "id", "original_name", "stored_path", "mime_type", "size_bytes", "checksum", "uploaded_at"
+]
+JSON_DATASET_LIST_FIELDS = [
+    "id", "storage_type", "sql_table_name", "mongo_collection_name", "original_name", "indexes", "created_at"
+]
+
+def parse_list_fields(fields: str | None, allowed: List[str], default: List[str]) -> List[str]:
+    if not fields:
+        return default
+    selected = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in selected if f not in allowed]
+    if unknown:
+        raise HTTPException(400, f"Unknown fields: {', '.join(unknown)}")
+    return selected
+
+def json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+def page_response(rows: List[dict], limit: int, total: int | None = None) -> Response:
+    """
+    Returns a page as a plain JSON array. The cursor for the next page
+    (X-Next-Before-Id) and the optional total (X-Total-Count) are sent
+    as headers so existing clients that expect a list keep working.
+    """
+    headers = {}
+    if len(rows) == limit:
+        headers["X-Next-Before-Id"] = str(rows[-1]["id"])
+    if total is not None:
+        headers["X-Total-Count"] = str(total)
+    body = json.dumps(rows, default=json_default)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.get("/files")
+def list_files(
+    limit: int = Query(default=100, ge=1, le=1000),
+    before_id: int | None = Query(default=None),
+    fields: str | None = Query(default=None),
+    include_total: bool = Query(default=False),
+    db: Session = Depends(get_db)
+):
+    """
+    Files newest first, one page at a time. Pass the X-Next-Before-Id
+    response header back as `before_id` for the next page.
+    """
+    selected = parse_list_fields(fields, FILE_LIST_FIELDS, FILE_LIST_FIELDS)
+    rows = crud.list_rows(db, models.FileMetadata, selected, limit, before_id)
+    total = crud.count_rows(db, models.FileMetadata) if include_total else None
+    return page_response(rows, limit, total)
 
 @app.get("/files/tree")
 def get_file_tree(db: Session = Depends(get_db)):
-    files = db.query(models.FileMetadata).all()
+    """
+    Full tree: { category: { subfolder: [files] } or [files] }.
+    Served from an incrementally maintained in-process cache.
+    """
+    return Response(content=tree_cache.get_json(db), media_type="application/json")
 
-    tree: Dict[str, Any] = {} 
 
-    for f in files:
-        if not f.stored_path:
-            continue
+@app.get("/files/tree/level")
+def get_file_tree_level(
+    path: str = Query(default=""),
+    limit: int = Query(default=500, ge=1, le=5000),
+    before_id: int | None = Query(default=None),
+    db: Session = Depends(get_db)
+):
+    """
+    One folder level for on-demand expansion: direct subfolders with
+    their (recursive) file counts and total sizes, plus a page of the
+    files stored directly in `path` (newest first; pass `next_before_id`
+    back as `before_id` for the next page).
+    """
+    path = path.strip("/")
+    stats = crud.get_folder_stats(db, path)
+    if stats is None:
+        raise HTTPException(404, "Folder not found")
 
-        parts = f.stored_path.split("/")
-        if not parts:
-            continue
+    files = crud.get_files_in_folder(db, path, limit, before_id)
 
-        category = parts[0] 
-        filename = parts[-1]
-        subfolder: str | None = None
+    return {
+        "path": path,
+        "file_count": stats.file_count,
+        "total_size": stats.total_size,
+        "folders": [
+            {
+                "name": sub.path.rsplit("/", 1)[-1],
+                "path": sub.path,
+                "file_count": sub.file_count,
+                "total_size": sub.total_size,
+            }
+            for sub in crud.get_subfolder_stats(db, path)
+            if sub.file_count > 0
+        ],
+        "files": [file_info(f) for f in files],
+        "next_before_id": files[-1].id if len(files) == limit else None,
+    }
 
-        if len(parts) >= 3:
-            subfolder = parts[1]
 
-        file_info = {
-            "id": f.id,
-            "name": f.original_name or filename,
-            "stored_path": f.stored_path,
-            "mime_type": f.mime_type,
-            "size_bytes": f.size_bytes,
-            "created_at": f.created_at.isoformat() if getattr(f, "created_at", None) else None,
+def presign_file(meta: models.FileMetadata, disposition: str) -> Dict[str, Any]:
+    """
+    Presigns a GET for the file and caches the result per file row and
+    disposition until shortly before the URL expires.
+    """
+    response_headers = None
+    if disposition == "attachment":
+        response_headers = {
+            "response-content-disposition": f'attachment; filename="{meta.original_name}"'
         }
 
-        if subfolder:
-            if category not in tree or not isinstance(tree[category], dict):
-                tree[category] = {}
-            if subfolder not in tree[category]:
-                tree[category][subfolder] = []
-            tree[category][subfolder].append(file_info)
-        else:
-            if category not in tree or isinstance(tree[category], dict):
-                tree[category] = []
-            tree[category].append(file_info)
-
-    return tree
-
+    url = get_minio_client().presigned_get_object(
+        bucket_name=BUCKET,
+        object_name=meta.stored_path,
+        expires=timedelta(seconds=PRESIGNED_URL_EXPIRY_SECONDS),
+        response_headers=response_headers
+    )
 
+    if disposition == "attachment":
+        result = {"url": url, "filename": meta.original_name}
+    else:
+        result = {"url": url, "mime_type": meta.mime_type}
 
+    presigned_urls.put(url_key(meta, disposition), result)
+    return result
 
-@app.get("/view/{file_id}")
-def view_file(file_id: int, db: Session = Depends(get_db)):
+def get_file_url(db: Session, file_id: int, disposition: str) -> Dict[str, Any]:
     meta = db.query(models.FileMetadata).filter(models.FileMetadata.id == file_id).first()
     if not meta:
         raise HTTPException(status_code=404, detail="File not found")
+
+    cached = presigned_urls.get(url_key(meta, disposition))
+    if cached is not None:
+        return cached
     try:
-        url = minio_client.presigned_get_object(
-            bucket_name=BUCKET,
-            object_name=meta.stored_path,
-            expires=timedelta(minutes=10)
-        )
+        return presign_file(meta, disposition)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating presigned URL: {str(e)}")
-    return {
-        "url": url,
-        "mime_type": meta.mime_type
-    }
+
+@app.get("/view/{file_id}")
+def view_file(file_id: int, db: Session = Depends(get_db)):
+    return get_file_url(db, file_id, "inline")
 
 @app.get("/download/{file_id}")
 def download_file(file_id: int, db: Session = Depends(get_db)):
-    meta = db.query(models.FileMetadata).filter(models.FileMetadata.id == file_id).first()
+    return get_file_url(db, file_id, "attachment")
 
+@app.get("/thumb/{file_id}")
+def get_thumbnail(file_id: int, db: Session = Depends(get_db)):
+    """
+    Presigned URL of a file's thumbnail (images) or poster frame
+    (videos). Responds 202 while it is still being generated.
+    """
+    meta = db.query(models.FileMetadata).filter(models.FileMetadata.id == file_id).first()
     if not meta:
         raise HTTPException(status_code=404, detail="File not found")
-    original_name = meta.original_name
+
+    cached = presigned_urls.get(url_key(meta, "thumb"))
+    if cached is not None:
+        return cached
+
+    if not wants_thumbnail(meta) or meta.thumbnail_status in ("failed", "unsupported"):
+        raise HTTPException(status_code=404, detail="No thumbnail for this file")
+
+    if meta.thumbnail_status != "ready":
+        # Files stored before the pipeline existed are queued on first request.
+        if meta.thumbnail_status is None:
+            meta.thumbnail_status = "pending"
+            db.commit()
+            schedule_thumbnail(get_minio_client(), BUCKET, meta)
+        return JSONResponse(status_code=202, content={"status": "pending"})
+
     try:
-        url = minio_client.presigned_get_object(
+        url = get_minio_client().presigned_get_object(
             bucket_name=BUCKET,
-            object_name=meta.stored_path,
-            expires=timedelta(minutes=10),
-            response_headers={
-                "response-content-disposition": f'attachment; filename="{original_name}"'
-            }
+            object_name=meta.thumbnail_path,
+            expires=timedelta(seconds=PRESIGNED_URL_EXPIRY_SECONDS)
         )
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Could not generate download URL: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error generating presigned URL: {str(e)}")
+
+    result = {"status": "ready", "url": url, "mime_type": "image/jpeg"}
+    presigned_urls.put(url_key(meta, "thumb"), result)
+    return result
+
+@app.post("/urls")
+def get_file_urls(
+    ids: List[int] = Body(..., embed=True),
+    download: bool = Body(default=False, embed=True),
+    db: Session = Depends(get_db)
+):
+    """
+    Presigned URLs for many files in one request (e.g. a gallery view).
+    The rows are looked up with one query; cached URLs are reused.
+    """
+    if len(ids) > 1000:
+        raise HTTPException(400, "At most 1000 ids per request")
+
+    disposition = "attachment" if download else "inline"
+    urls: Dict[int, Any] = {}
+    wanted = list(dict.fromkeys(ids))
+
+    rows = db.query(models.FileMetadata).filter(models.FileMetadata.id.in_(wanted)).all()
+    for meta in rows:
+        cached = presigned_urls.get(url_key(meta, disposition))
+        if cached is not None:
+            urls[meta.id] = cached
+            continue
+        try:
+            urls[meta.id] = presign_file(meta, disposition)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error generating presigned URL: {str(e)}")
 
     return {
-        "url": url,
-        "filename": original_name
+        "urls": urls,
+        "missing": [file_id for file_id in wanted if file_id not in urls]
     }
 
 @app.delete("/delete/{file_id}")
@@ -234,133 +502,439 @@ def delete_file(file_id: int, db: Session = Depends(get_db)):
     if not meta:
         raise HTTPException(status_code=404, detail="File not found")
 
+    stored_path = meta.stored_path
+    thumbnail_path = meta.thumbnail_path
     try:
-        minio_client.remove_object(
-            bucket_name=BUCKET,
-            object_name=meta.stored_path
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error removing MinIO object: {str(e)}")
-
-    try:
-        db.delete(meta)
-        db.commit()
+        last_reference = crud.delete_file_metadata(db, meta)
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Error deleting metadata: {str(e)}")
+    tree_cache.remove(meta)
+    forget_file(meta)
+
+    # Deduplicated objects are shared; only the last reference removes it.
+    if last_reference:
+        feature_index.forget(db, stored_path)
+        try:
+            get_minio_client().remove_object(
+                bucket_name=BUCKET,
+                object_name=stored_path
+            )
+            if thumbnail_path:
+                get_minio_client().remove_object(bucket_name=BUCKET, object_name=thumbnail_path)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error removing MinIO object: {str(e)}")
 
     return {"status": "deleted", "id": file_id}
 
 
 @app.get("/search", response_model=List[schemas.FileMetadataResponse])
-def search_files(query: str = Query(..., min_length=1), db: Session = Depends(get_db)):
-    results = crud.search_files(db, query)
-    return results
-
-from fastapi import Form
-@app.post("/json/file")
-async def upload_json_file(
-    file: UploadFile = File(...),
+def search_files(
+    query: str = Query(..., min_length=1),
+    limit: int = Query(default=50, ge=1, le=500),
+    offset: int = Query(default=0, ge=0),
     db: Session = Depends(get_db)
 ):
-    if not file.filename.lower().endswith(".json"):
-        raise HTTPException(400, "Only .json files allowed")
+    results = crud.search_files(db, query, limit=limit, offset=offset)
+    return results
 
-    content = await file.read()
+from fastapi import Form
+async def submit_ingest_job(original_name: str | None, path: str | None = None, data=None):
     try:
-        parsed_json = json.loads(content)
-    except Exception:
-        raise HTTPException(400, "Invalid JSON file")
+        # Reserves the dataset row, which may wait for a concurrent writer.
+        job = await run_db(ingest_jobs.submit, original_name, path=path, data=data)
+    except JobQueueFull:
+        raise HTTPException(429, "Too many ingestion jobs in progress, retry later")
+    return {"job_id": job.id, "status": job.status, "status_url": f"/jobs/{job.id}"}
+
+@app.post("/json/file", status_code=202)
+async def upload_json_file(file: UploadFile = File(...)):
+    """
+    Queues ingestion of a JSON / NDJSON file; poll /jobs/{job_id} for
+    progress and the resulting dataset_id.
+    """
+    name = file.filename.lower()
+    if not name.endswith(JSON_EXTENSIONS):
+        raise HTTPException(400, "Only .json / .ndjson / .jsonl files allowed")
 
-    return ingest_json(db, parsed_json, original_name=file.filename)
+    return await queue_json_file(file)
 
-@app.post("/json/upload")
-async def upload_json_body(
-    json_body: dict | list = Body(...),
-    db: Session = Depends(get_db)
-):
-    return ingest_json(db, json_body)
+async def queue_json_file(file: UploadFile) -> Dict[str, Any]:
+    suffix = "." + file.filename.lower().rsplit(".", 1)[-1]
+    path = await run_storage(save_upload, file.file, suffix)
+    return await submit_ingest_job(file.filename, path=path)
+
+@app.post("/json/upload", status_code=202)
+async def upload_json_body(json_body: dict | list = Body(...)):
+    """
+    Queues ingestion of a JSON body; poll /jobs/{job_id} for the result.
+    """
+    return await submit_ingest_job(None, data=json_body)
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str, db: Session = Depends(get_db)):
+    """
+    Status of an ingestion job: status (queued, running, done, failed),
+    rows_written and rows_per_sec so far, and dataset_id once done.
+    """
+    job = ingest_jobs.get(job_id)
+    if job is not None:
+        return job.to_dict()
+
+    # Submitted through another API worker (no live progress) or before
+    # a restart.
+    saved = crud.get_ingest_job(db, job_id)
+    if saved is None:
+        raise HTTPException(404, "Job not found")
+    return saved
 
 from sqlalchemy import or_
 
 @app.get("/json/datasets")
 def list_json_datasets(
     query: str = Query(default=""),
+    limit: int = Query(default=100, ge=1, le=1000),
+    before_id: int | None = Query(default=None),
+    fields: str | None = Query(default=None),
+    include_total: bool = Query(default=False),
     db: Session = Depends(get_db)
 ):
     """
-    List all JSON datasets stored in json_datasets table.
+    List JSON datasets stored in json_datasets table, newest first, one
+    page at a time (see /files for the paging headers).
     Supports search by ID, SQL table name, or Mongo collection name.
     """
-    q = db.query(models.JsonDataset)
+    conditions = [models.JsonDataset.storage_type != models.PENDING_DATASET]
 
     if query:
         like = f"%{query}%"
-        conditions = [
+        matches = [
             models.JsonDataset.sql_table_name.ilike(like),
             models.JsonDataset.mongo_collection_name.ilike(like)
         ]
         if query.isdigit():
-            conditions.append(models.JsonDataset.id == int(query))
+            matches.append(models.JsonDataset.id == int(query))
 
-        q = q.filter(or_(*conditions))
+        conditions.append(or_(*matches))
 
-    datasets = q.order_by(models.JsonDataset.id).all()
-
-    out = []
-    for ds in datasets:
-        out.append({
-            "id": ds.id,
-            "storage_type": ds.storage_type,
-            "sql_table_name": ds.sql_table_name,
-            "mongo_collection_name": ds.mongo_collection_name,
-            "created_at": ds.created_at.isoformat() if ds.created_at else None
-        })
+    selected = parse_list_fields(fields, JSON_DATASET_LIST_FIELDS, JSON_DATASET_LIST_FIELDS)
+    rows = crud.list_rows(db, models.JsonDataset, selected, limit, before_id, conditions)
+    for row in rows:
+        if "indexes" in row and row["indexes"] is None:
+            row["indexes"] = []
 
-    return out
+    total = crud.count_rows(db, models.JsonDataset, conditions) if include_total else None
+    return page_response(rows, limit, total)
 
 @app.get("/json/search")
-def search_json_datasets(q: str, db: Session = Depends(get_db)):
-    results = crud.search_json_datasets(db, q)
+def search_json_datasets(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(default=50, ge=1, le=500),
+    offset: int = Query(default=0, ge=0),
+    db: Session = Depends(get_db)
+):
+    results = crud.search_json_datasets(db, q, limit=limit, offset=offset)
     return results
 
+def cache_response(cache_key, response: Dict[str, Any]) -> Response:
+    body = json.dumps(
+        response, default=str, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+    dataset_results.put(cache_key, body)
+    return Response(body, media_type="application/json", headers={"X-Cache": "MISS"})
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(row, default=str) + "\n"
+
 @app.get("/json/{dataset_id}")
-def get_json_dataset(dataset_id: int, db: Session = Depends(get_db)):
+def get_json_dataset(
+    dataset_id: int,
+    after_id: str | None = Query(default=None),
+    limit: int | None = Query(default=None, ge=1, le=10000),
+    format: str = Query(default="json", pattern="^(json|ndjson)$"),
+    fields: str | None = Query(default=None),
+    filters: List[str] = Query(default=[], alias="filter"),
+    db: Session = Depends(get_db),
+    mongo_db: Database = Depends(get_mongo_db)
+):
+    """
+    Returns a dataset's rows.
+    - `limit` / `after_id`: keyset pagination over `_id`; pass the
+      response's `next_after_id` to fetch the following page.
+    - `format=ndjson`: streams every row (after `after_id`) as
+      newline-delimited JSON from a server-side cursor.
+    - `fields=a,b`: only return these columns.
+    - `filter=field:op:value` (repeatable): op is one of eq, ne, gt, gte,
+      lt, lte, in (comma-separated values) or prefix. Filters and fields
+      are evaluated by SQLite / MongoDB, not in Python.
+    """
     meta = crud.get_json_dataset(db, dataset_id)
     if not meta:
         raise HTTPException(404, "Dataset not found")
 
+    try:
+        field_list = parse_fields(fields)
+        predicates = parse_filters(filters)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    query = {"fields": field_list, "predicates": predicates}
+
+    # Datasets are write-once, so JSON pages are served from the result
+    # cache. created_at is part of the key because ids can be reused
+    # after a reset (possibly by another worker).
+    cache_key = (
+        dataset_id, meta.created_at, after_id, limit, tuple(field_list or ()), tuple(filters)
+    )
+    if format == "json":
+        cached = dataset_results.get(cache_key)
+        if cached is not None:
+            return Response(cached, media_type="application/json", headers={"X-Cache": "HIT"})
+
     if meta.storage_type == "sql":
         if not meta.sql_table_name:
             raise HTTPException(500, "SQL table missing for dataset")
-        data = retrieve_sql_dataset(db, meta.sql_table_name)
-        return {
+
+        cursor = None
+        if after_id is not None:
+            if not after_id.isdigit():
+                raise HTTPException(400, "after_id must be an integer for SQL datasets")
+            cursor = int(after_id)
+
+        try:
+            if format == "ndjson":
+                rows = iter_sql_dataset(db.bind, meta.sql_table_name, after_id=cursor, **query)
+                return StreamingResponse(ndjson_lines(rows), media_type="application/x-ndjson")
+
+            data = retrieve_sql_dataset(db, meta.sql_table_name, after_id=cursor, limit=limit, **query)
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+        response = {
             "dataset_id": dataset_id,
             "storage_type": "sql",
             "data": data
         }
+        if limit is not None:
+            response["next_after_id"] = data[-1]["_id"] if len(data) == limit else None
+        return cache_response(cache_key, response)
 
     if meta.storage_type == "nosql":
         if not meta.mongo_collection_name:
             raise HTTPException(500, "Mongo collection missing for dataset")
-        data = retrieve_nosql_dataset(meta.mongo_collection_name)
-        return {
+
+        cursor = None
+        if after_id is not None:
+            if not ObjectId.is_valid(after_id):
+                raise HTTPException(400, "after_id must be an ObjectId for NoSQL datasets")
+            cursor = ObjectId(after_id)
+
+        try:
+            if format == "ndjson":
+                docs = iter_nosql_dataset(mongo_db, meta.mongo_collection_name, after_id=cursor, **query)
+                return StreamingResponse(ndjson_lines(docs), media_type="application/x-ndjson")
+
+            data = retrieve_nosql_dataset(
+                mongo_db, meta.mongo_collection_name, after_id=cursor, limit=limit, **query
+            )
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+        response = {
             "dataset_id": dataset_id,
             "storage_type": "nosql",
             "data": data
         }
+        if limit is not None:
+            response["next_after_id"] = data[-1]["_id"] if len(data) == limit else None
+        return cache_response(cache_key, response)
 
     raise HTTPException(500, "Invalid dataset configuration")
 
+def get_dataset_or_404(db: Session, dataset_id: int) -> models.JsonDataset:
+    meta = crud.get_json_dataset(db, dataset_id)
+    if not meta:
+        raise HTTPException(404, "Dataset not found")
+    return meta
+
+@app.get("/json/{dataset_id}/indexes")
+def list_dataset_indexes(dataset_id: int, db: Session = Depends(get_db)):
+    meta = get_dataset_or_404(db, dataset_id)
+    return {"dataset_id": dataset_id, "indexes": meta.indexes or []}
+
+@app.post("/json/{dataset_id}/indexes")
+def add_dataset_index(
+    dataset_id: int,
+    field: str = Body(..., embed=True),
+    db: Session = Depends(get_db),
+    mongo_db: Database = Depends(get_mongo_db)
+):
+    """
+    Adds a secondary index on `field` and records it on the dataset.
+    """
+    meta = get_dataset_or_404(db, dataset_id)
+
+    try:
+        if meta.storage_type == "sql":
+            create_sql_index(db.bind, meta.sql_table_name, field)
+        else:
+            create_nosql_index(mongo_db, meta.mongo_collection_name, field)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+    indexes = list(meta.indexes or [])
+    if field not in indexes:
+        indexes.append(field)
+        crud.update_json_dataset(db, dataset_id, {"indexes": indexes})
+
+    return {"dataset_id": dataset_id, "indexes": indexes}
+
+@app.delete("/json/{dataset_id}/indexes/{field}")
+def drop_dataset_index(
+    dataset_id: int,
+    field: str,
+    db: Session = Depends(get_db),
+    mongo_db: Database = Depends(get_mongo_db)
+):
+    meta = get_dataset_or_404(db, dataset_id)
+
+    if meta.storage_type == "sql":
+        drop_sql_index(db.bind, meta.sql_table_name, field)
+    else:
+        drop_nosql_index(mongo_db, meta.mongo_collection_name, field)
+
+    indexes = [f for f in (meta.indexes or []) if f != field]
+    crud.update_json_dataset(db, dataset_id, {"indexes": indexes})
+
+    return {"dataset_id": dataset_id, "indexes": indexes}
+
+EXPORT_FORMAT_PATTERN = "^(" + "|".join(EXPORT_FORMATS) + ")$"
+
+def export_response(dataset_id: int, object_name: str, fmt: str, **extra) -> Dict[str, Any]:
+    url = get_minio_client().presigned_get_object(
+        bucket_name=BUCKET,
+        object_name=object_name,
+        expires=timedelta(seconds=PRESIGNED_URL_EXPIRY_SECONDS)
+    )
+    return {
+        "dataset_id": dataset_id,
+        "format": fmt,
+        "object_name": object_name,
+        **extra,
+        "url": url,
+        "expires_in": PRESIGNED_URL_EXPIRY_SECONDS
+    }
+
+def run_export(db: Session, mongo_db: Database, meta: models.JsonDataset, fmt: str):
+    try:
+        return export_dataset(db.bind, mongo_db, meta, get_minio_client(), BUCKET, fmt)
+    except ExportUnavailable as e:
+        raise HTTPException(501, str(e))
+
+@app.post("/json/{dataset_id}/export", dependencies=[Depends(require_bucket)])
+def create_dataset_export(
+    dataset_id: int,
+    format: str = Query(default="parquet", pattern=EXPORT_FORMAT_PATTERN),
+    db: Session = Depends(get_db),
+    mongo_db: Database = Depends(get_mongo_db)
+):
+    """
+    Snapshots a dataset to a columnar file (Parquet, or Arrow IPC for
+    memory-mapped reads) in the bucket, replacing any earlier export,
+    and returns a presigned URL for it.
+    """
+    meta = get_dataset_or_404(db, dataset_id)
+    info = run_export(db, mongo_db, meta, format)
+    return export_response(dataset_id, info.object_name, format, rows=info.rows, size_bytes=info.size_bytes)
+
+@app.get("/json/{dataset_id}/export", dependencies=[Depends(require_bucket)])
+def download_dataset_export(
+    dataset_id: int,
+    format: str = Query(default="parquet", pattern=EXPORT_FORMAT_PATTERN),
+    presigned: bool = Query(default=False),
+    db: Session = Depends(get_db),
+    mongo_db: Database = Depends(get_mongo_db)
+):
+    """
+    Streams the dataset's columnar export, creating it first if there is
+    none. With `presigned=true`, returns a presigned URL instead so the
+    client downloads straight from MinIO.
+    """
+    meta = get_dataset_or_404(db, dataset_id)
+    object_name = export_object_name(meta, format)
+    client = get_minio_client()
+
+    # Datasets do not change after ingestion, so an existing export is current.
+    try:
+        size_bytes = client.stat_object(BUCKET, object_name).size
+    except Exception:
+        size_bytes = run_export(db, mongo_db, meta, format).size_bytes
+
+    if presigned:
+        return export_response(dataset_id, object_name, format, size_bytes=size_bytes)
+
+    obj = client.get_object(BUCKET, object_name)
+
+    def body():
+        try:
+            yield from obj.stream(1024 * 1024)
+        finally:
+            obj.close()
+            obj.release_conn()
+
+    filename = f"json_ds_{dataset_id}{EXPORT_FORMATS[format][0]}"
+    return StreamingResponse(
+        body(),
+        media_type=EXPORT_FORMATS[format][1],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "Content-Length": str(size_bytes)
+        }
+    )
+
 from sqlalchemy import text
-from pymongo import MongoClient
+
+@app.delete("/json/{dataset_id}")
+def delete_json_dataset(
+    dataset_id: int,
+    db: Session = Depends(get_db),
+    mongo_db: Database = Depends(get_mongo_db)
+):
+    """
+    Drops a dataset's table or collection, its columnar exports and its
+    metadata row.
+    """
+    meta = get_dataset_or_404(db, dataset_id)
+
+    try:
+        if meta.storage_type == "sql":
+            db.execute(text(f'DROP TABLE IF EXISTS "{meta.sql_table_name}"'))
+        else:
+            mongo_db.drop_collection(meta.mongo_collection_name)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(500, f"Error dropping dataset storage: {str(e)}")
+
+    for name in export_object_names(meta):
+        try:
+            get_minio_client().remove_object(BUCKET, name)
+        except Exception as e:
+            logger.warning("Error removing dataset export %s: %s", name, e)
+
+    db.delete(meta)
+    db.commit()
+    dataset_results.invalidate(dataset_id)
+
+    return {"status": "deleted", "dataset_id": dataset_id}
 
 @app.delete("/debug/reset-json-system")
-def reset_json_system(db: Session = Depends(get_db)):
+def reset_json_system(
+    db: Session = Depends(get_db),
+    mongo_db: Database = Depends(get_mongo_db)
+):
     """
     Completely clean all JSON ingestion data:
     - Drop SQL tables created for JSON datasets
     - Drop MongoDB collections created for JSON datasets
+    - Remove their columnar exports from the bucket
     - Clear json_datasets metadata table
     """
 
@@ -375,20 +949,25 @@ def reset_json_system(db: Session = Depends(get_db)):
                 db.execute(text(f'DROP TABLE IF EXISTS "{ds.sql_table_name}"'))
                 dropped_sql_tables.append(ds.sql_table_name)
             except Exception as e:
-                print("Error dropping SQL table:", e)
+                logger.warning("Error dropping SQL table %s: %s", ds.sql_table_name, e)
 
 
         if ds.storage_type == "nosql" and ds.mongo_collection_name:
             try:
-                client = MongoClient("mongodb://localhost:27017/")
-                mongo_db = client["json_ingestion"]
                 mongo_db.drop_collection(ds.mongo_collection_name)
                 dropped_mongo_collections.append(ds.mongo_collection_name)
             except Exception as e:
-                print("Error dropping Mongo collection:", e)
+                logger.warning("Error dropping Mongo collection %s: %s", ds.mongo_collection_name, e)
+
+        for name in export_object_names(ds):
+            try:
+                get_minio_client().remove_object(BUCKET, name)
+            except Exception as e:
+                logger.warning("Error removing dataset export %s: %s", name, e)
 
     db.query(models.JsonDataset).delete()
     db.commit()
+    dataset_results.clear()
 
     return {
         "status": "reset-complete",
@@ -398,5 +977,33 @@ def reset_json_system(db: Session = Depends(get_db)):
     }
 
 
+@app.get("/metrics")
+def metrics():
+    """
+    Request and hot-path latency histograms in Prometheus text format.
+    """
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/debug/result-cache")
+def result_cache_stats():
+    """
+    Size and hit/miss counters of the /json/{id} result cache.
+    """
+    return dataset_results.stats()
+
+@app.get("/debug/startup")
+def startup_report():
+    """
+    Cold-start timings of this worker: module import and lifespan startup.
+    """
+    return {**startup_timings, "budget_seconds": STARTUP_BUDGET_SECONDS}
+
+@app.get("/debug/mongo-pool")
+def mongo_pool_stats():
+    """
+    Connection pool usage of the shared MongoClient.
+    """
+    return pool_metrics.snapshot()
 
 
+startup_timings["import_seconds"] = round(time.perf_counter() - _import_started, 4)
@@ -0,0 +1,201 @@
+import functools
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from .config import PROFILE_REQUESTS, PROFILE_SAMPLE_RATE, SLOW_REQUEST_SECONDS
+
+# Upper bounds (seconds) shared by all histograms.
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+PROFILE_HEADER = "x-profile"
+
+
+class Histogram:
+    """
+    Cumulative Prometheus-style histogram, one series per label set.
+    """
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...], buckets=BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        # labels -> [bucket counts..., +Inf count], sum
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][index] += 1
+            series[1][0] += value
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            snapshot = [(key, list(counts), total[0]) for key, (counts, total) in sorted(self._series.items())]
+
+        for key, counts, total in snapshot:
+            labels = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(self.labelnames, key))
+            sep = "," if labels else ""
+            running = 0
+            for bound, count in zip(self.buckets, counts):
+                running += count
+                yield f'{self.name}_bucket{{{labels}{sep}le="{bound}"}} {running}'
+            running += counts[-1]
+            yield f'{self.name}_bucket{{{labels}{sep}le="+Inf"}} {running}'
+            yield f"{self.name}_sum{{{labels}}} {total}"
+            yield f"{self.name}_count{{{labels}}} {running}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Time from request start to the end of the response body.",
+    ("method", "route", "status"),
+)
+
+SPAN_SECONDS = Histogram(
+    "app_span_duration_seconds",
+    "Time spent in instrumented hot-path calls.",
+    ("span",),
+)
+
+# Spans recorded during the current request (or ingestion job) when it
+# is being profiled; None otherwise.
+_collector: ContextVar[List[Tuple[str, float]] | None] = ContextVar("span_collector", default=None)
+
+
+@contextmanager
+def span(name: str):
+    """
+    Times the enclosed block into SPAN_SECONDS.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        SPAN_SECONDS.observe(elapsed, span=name)
+        spans = _collector.get()
+        if spans is not None:
+            spans.append((name, elapsed))
+
+
+def timed(name: str) -> Callable:
+    """
+    Decorator form of span(). For functions returning a lazy iterator
+    only the setup is timed.
+    """
+    def decorate(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+@contextmanager
+def collect_spans():
+    """
+    Collects (name, seconds) of every span finished inside the block,
+    including in pool threads started from it (see concurrency.run_in_pool).
+    """
+    spans: List[Tuple[str, float]] = []
+    token = _collector.set(spans)
+    try:
+        yield spans
+    finally:
+        _collector.reset(token)
+
+
+def observe_spans(spans: Iterable[Tuple[str, float]]):
+    """
+    Records spans measured in another process (ingestion workers).
+    """
+    for name, seconds in spans:
+        SPAN_SECONDS.observe(seconds, span=name)
+
+
+def render_metrics() -> str:
+    lines = []
+    for histogram in (REQUEST_SECONDS, SPAN_SECONDS):
+        lines.extend(histogram.render())
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request by route template.
+    A request is profiled when it sends `X-Profile: 1` (and
+    PROFILE_REQUESTS is on) or is picked by PROFILE_SAMPLE_RATE: its
+    span breakdown is returned in a Server-Timing header and printed if
+    it took longer than SLOW_REQUEST_SECONDS.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = (
+            PROFILE_REQUESTS and (PROFILE_HEADER.encode(), b"1") in scope.get("headers", [])
+        ) or (PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE)
+
+        started = time.perf_counter()
+        status = [500]
+
+        with collect_spans() if profile else _no_spans() as spans:
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    status[0] = message["status"]
+                    if spans is not None:
+                        message = dict(message, headers=list(message.get("headers", [])) + [
+                            (b"server-timing", _server_timing(spans, time.perf_counter() - started).encode())
+                        ])
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                elapsed = time.perf_counter() - started
+                route = scope.get("route")
+                REQUEST_SECONDS.observe(
+                    elapsed,
+                    method=scope["method"],
+                    route=getattr(route, "path", "unmatched"),
+                    status=status[0],
+                )
+                if spans is not None and elapsed >= SLOW_REQUEST_SECONDS:
+                    print(
+                        f"Slow request {scope['method']} {scope['path']} {elapsed:.3f}s:",
+                        _server_timing(spans, elapsed)
+                    )
+
+
+@contextmanager
+def _no_spans():
+    yield None
+
+
+def _server_timing(spans: List[Tuple[str, float]], total: float) -> str:
+    parts = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in spans]
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
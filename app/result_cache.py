@@ -0,0 +1,98 @@
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Dict, Hashable, Set, Tuple
+
+from .config import RESULT_CACHE_MAX_BYTES, RESULT_CACHE_MAX_ENTRY_BYTES, RESULT_CACHE_COMPRESS
+
+# Bodies smaller than this are stored as-is even with compression on.
+COMPRESS_MIN_BYTES = 1024
+
+
+class ResultCache:
+    """
+    LRU cache of serialized dataset responses, bounded by total stored
+    bytes. Keys are tuples whose first element is the dataset id, so all
+    pages of one dataset can be invalidated together.
+    """
+
+    def __init__(self, max_bytes: int, max_entry_bytes: int, compress: bool):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.compress = compress
+        self._lock = threading.Lock()
+        # key -> (stored bytes, compressed)
+        self._entries: "OrderedDict[Tuple, Tuple[bytes, bool]]" = OrderedDict()
+        self._by_dataset: Dict[Hashable, Set[Tuple]] = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Tuple) -> bytes | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+        data, compressed = entry
+        return zlib.decompress(data) if compressed else data
+
+    def put(self, key: Tuple, body: bytes):
+        data, compressed = body, False
+        if self.compress and len(body) >= COMPRESS_MIN_BYTES:
+            packed = zlib.compress(body, 1)
+            if len(packed) < len(body):
+                data, compressed = packed, True
+
+        if len(data) > self.max_entry_bytes:
+            return
+
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (data, compressed)
+            self._by_dataset.setdefault(key[0], set()).add(key)
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, dataset_id: Hashable):
+        with self._lock:
+            for key in list(self._by_dataset.get(dataset_id, ())):
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_dataset.clear()
+            self.size = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _remove(self, key: Tuple):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self.size -= len(entry[0])
+        keys = self._by_dataset.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_dataset[key[0]]
+
+
+dataset_results = ResultCache(RESULT_CACHE_MAX_BYTES, RESULT_CACHE_MAX_ENTRY_BYTES, RESULT_CACHE_COMPRESS)
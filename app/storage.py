@@ -0,0 +1,131 @@
+import hashlib
+import threading
+from typing import BinaryIO, Tuple
+from minio import Minio
+
+from .metrics import timed
+from .config import MINIO_ENDPOINT, MINIO_ACCESS_KEY, MINIO_SECRET_KEY, MINIO_SECURE, MINIO_BUCKET
+
+# MinIO multipart part size. Peak memory per upload is roughly one part,
+# regardless of how large the incoming file is (5 MiB is the S3 minimum).
+PART_SIZE = 10 * 1024 * 1024
+
+
+class HashingReader:
+    """
+    Read-only file wrapper that counts and hashes bytes as they are read,
+    so size and checksum are known once MinIO has consumed the stream.
+    """
+
+    def __init__(self, raw: BinaryIO):
+        self._raw = raw
+        self._hash = hashlib.sha256()
+        self.size = 0
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self._raw.read(size)
+        if chunk:
+            self._hash.update(chunk)
+            self.size += len(chunk)
+        return chunk
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+
+def hash_stream(raw: BinaryIO, chunk_size: int = 1024 * 1024) -> Tuple[int, str]:
+    """
+    Reads a file object to the end and returns (size_bytes, sha256 hex
+    digest), then rewinds it.
+    """
+    reader = HashingReader(raw)
+    while reader.read(chunk_size):
+        pass
+    raw.seek(0)
+    return reader.size, reader.hexdigest()
+
+
+@timed("put_object")
+def put_stream(
+    client: Minio,
+    bucket: str,
+    object_name: str,
+    raw: BinaryIO,
+    content_type: str | None = None,
+    part_size: int = PART_SIZE,
+    hashed: Tuple[int, str] | None = None,
+) -> Tuple[int, str]:
+    """
+    Streams a file object to MinIO as a multipart upload of unknown length.
+    Returns (size_bytes, sha256 hex digest). Pass `hashed` (the result of
+    hash_stream) when the file was already hashed; it is then sent with
+    its known length and not hashed a second time.
+    """
+    if hashed is not None:
+        client.put_object(
+            bucket_name=bucket,
+            object_name=object_name,
+            data=raw,
+            length=hashed[0],
+            part_size=part_size,
+            content_type=content_type or "application/octet-stream",
+        )
+        return hashed
+
+    reader = HashingReader(raw)
+
+    client.put_object(
+        bucket_name=bucket,
+        object_name=object_name,
+        data=reader,
+        length=-1,
+        part_size=part_size,
+        content_type=content_type or "application/octet-stream",
+    )
+
+    return reader.size, reader.hexdigest()
+
+
+_client: Minio | None = None
+_client_lock = threading.Lock()
+_bucket_ready = False
+
+
+def get_minio_client() -> Minio:
+    """
+    Returns the application-wide MinIO client, creating it on first use.
+    Construction does not touch the network.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = Minio(
+                    MINIO_ENDPOINT,
+                    access_key=MINIO_ACCESS_KEY,
+                    secret_key=MINIO_SECRET_KEY,
+                    secure=MINIO_SECURE
+                )
+    return _client
+
+
+def ensure_bucket(bucket: str = MINIO_BUCKET) -> bool:
+    """
+    Creates the bucket if it does not exist. Returns False instead of
+    raising when MinIO is unreachable, so startup can continue and the
+    check is retried on the next call.
+    """
+    global _bucket_ready
+    if _bucket_ready:
+        return True
+
+    client = get_minio_client()
+    try:
+        if not client.bucket_exists(bucket):
+            client.make_bucket(bucket)
+    except Exception as e:
+        print("MinIO bucket check failed:", e)
+        return False
+
+    _bucket_ready = True
+    return True
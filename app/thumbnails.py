@@ -0,0 +1,142 @@
+import io
+import shutil
+import subprocess
+import tempfile
+from datetime import timedelta
+from minio import Minio
+
+from .config import THUMBNAIL_SIZE
+from .concurrency import media_pool
+from .db import models
+from .db.database import SessionLocal
+
+# Derived objects live under their own prefix so they never show up in
+# the file tree: derived/thumbs/<stored_path>.jpg
+DERIVED_PREFIX = "derived/thumbs/"
+
+IMAGE_FOLDER = "media/images"
+VIDEO_FOLDER = "media/videos"
+
+# Pillow cannot rasterize SVG.
+UNSUPPORTED_IMAGE_EXTENSIONS = (".svg",)
+
+
+def thumbnail_object_name(stored_path: str) -> str:
+    return f"{DERIVED_PREFIX}{stored_path}.jpg"
+
+
+def wants_thumbnail(meta: models.FileMetadata) -> bool:
+    return (meta.folder or "").startswith((IMAGE_FOLDER, VIDEO_FOLDER))
+
+
+def schedule_thumbnail(client: Minio, bucket: str, meta: models.FileMetadata):
+    """
+    Queues thumbnail generation for an image/video upload on the media
+    pool; the upload request does not wait for it.
+    """
+    if not wants_thumbnail(meta):
+        return
+    media_pool.submit(generate_thumbnail, client, bucket, meta.id)
+
+
+def generate_thumbnail(client: Minio, bucket: str, file_id: int):
+    """
+    Builds a JPEG thumbnail (images) or poster frame (videos), stores it
+    in the bucket and records it on the file row. Runs on its own
+    session in a media worker thread.
+    """
+    db = SessionLocal()
+    try:
+        meta = db.query(models.FileMetadata).filter(models.FileMetadata.id == file_id).first()
+        if meta is None:
+            return
+
+        # Deduplicated uploads share an object, and so its thumbnail.
+        sibling = (
+            db.query(models.FileMetadata)
+            .filter(
+                models.FileMetadata.stored_path == meta.stored_path,
+                models.FileMetadata.thumbnail_status == "ready"
+            )
+            .first()
+        )
+        if sibling is not None:
+            _set_status(db, meta, "ready", sibling.thumbnail_path)
+            return
+
+        _set_status(db, meta, "pending")
+
+        try:
+            if meta.folder.startswith(IMAGE_FOLDER):
+                data = _image_thumbnail(client, bucket, meta.stored_path)
+            else:
+                data = _video_poster(client, bucket, meta.stored_path)
+        except Exception as e:
+            print("Thumbnail generation failed:", e)
+            _set_status(db, meta, "failed")
+            return
+
+        if data is None:
+            _set_status(db, meta, "unsupported")
+            return
+
+        name = thumbnail_object_name(meta.stored_path)
+        client.put_object(bucket, name, io.BytesIO(data), length=len(data), content_type="image/jpeg")
+        _set_status(db, meta, "ready", name)
+    finally:
+        db.close()
+
+
+def _set_status(db, meta: models.FileMetadata, status: str, path: str | None = None):
+    meta.thumbnail_status = status
+    meta.thumbnail_path = path
+    db.commit()
+
+
+def _image_thumbnail(client: Minio, bucket: str, object_name: str) -> bytes | None:
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+
+    if object_name.lower().endswith(UNSUPPORTED_IMAGE_EXTENSIONS):
+        return None
+
+    response = client.get_object(bucket, object_name)
+    try:
+        with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as tmp:
+            for chunk in response.stream(1024 * 1024):
+                tmp.write(chunk)
+            tmp.seek(0)
+
+            with Image.open(tmp) as img:
+                # draft() lets JPEG decode at a reduced scale directly.
+                img.draft("RGB", (THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+                img.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+                out = io.BytesIO()
+                img.convert("RGB").save(out, "JPEG", quality=80, optimize=True)
+                return out.getvalue()
+    finally:
+        response.close()
+        response.release_conn()
+
+
+def _video_poster(client: Minio, bucket: str, object_name: str) -> bytes | None:
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        return None
+
+    # ffmpeg reads only what it needs through a presigned URL rather than
+    # the whole video being downloaded first.
+    url = client.presigned_get_object(bucket, object_name, expires=timedelta(minutes=10))
+    result = subprocess.run(
+        [
+            ffmpeg, "-v", "error", "-ss", "1", "-i", url,
+            "-frames:v", "1", "-vf", f"scale={THUMBNAIL_SIZE}:-2",
+            "-f", "image2", "-c:v", "mjpeg", "pipe:1",
+        ],
+        capture_output=True,
+        timeout=60,
+        check=True,
+    )
+    return result.stdout or None
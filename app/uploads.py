@@ -0,0 +1,267 @@
+import asyncio
+from typing import Any, BinaryIO, Dict, List, Tuple
+from minio import Minio
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from fastapi import HTTPException, UploadFile
+
+from .config import DEDUP_UPLOADS, BATCH_UPLOAD_CONCURRENCY
+from .concurrency import run_storage, run_db
+from .categorizer import compute_features, feature_index, ImageFeatures
+from .db import crud, schemas, models
+from .storage import put_stream, hash_stream
+from .utils import get_file_path, is_image
+
+
+async def store_upload(
+    db: Session,
+    client: Minio,
+    bucket: str,
+    fp: BinaryIO,
+    filename: str,
+    content_type: str | None
+) -> Tuple[models.FileMetadata, bool]:
+    """
+    Stores one uploaded file and its metadata.
+    With DEDUP_UPLOADS, the spooled file is hashed first; if an object
+    with the same sha256 exists, the new row references it and nothing
+    is sent to MinIO.
+    Returns (metadata row, deduplicated).
+    """
+    content_type = content_type or "application/octet-stream"
+    fp.seek(0)
+
+    hashed = None
+    if DEDUP_UPLOADS:
+        hashed = await run_storage(hash_stream, fp)
+        size_bytes, checksum = hashed
+        existing = await _reference_existing(db, filename, content_type, size_bytes, checksum)
+        if existing is not None:
+            return existing, True
+
+    features = await run_storage(compute_features, fp) if is_image(filename) else None
+    object_path = await _object_path(db, filename, features)
+
+    # Stream the spooled upload straight through to MinIO in fixed-size
+    # parts instead of reading the whole file into memory.
+    try:
+        size_bytes, checksum = await run_storage(
+            put_stream,
+            client,
+            bucket,
+            object_path,
+            fp,
+            content_type=content_type,
+            hashed=hashed
+        )
+    except Exception:
+        if features is not None:
+            await run_db(feature_index.forget, db, object_path)
+        raise
+
+    metadata = schemas.FileMetadataCreate(
+        original_name=filename,
+        stored_path=object_path,
+        mime_type=content_type,
+        size_bytes=size_bytes,
+        checksum=checksum
+    )
+
+    if not DEDUP_UPLOADS:
+        return await run_db(crud.save_file_metadata, db, metadata), False
+
+    try:
+        return await run_db(crud.save_file_metadata, db, metadata, new_object=True), False
+    except IntegrityError:
+        # A concurrent upload of the same content registered its object
+        # first: drop ours and reference theirs.
+        db.rollback()
+        await run_storage(client.remove_object, bucket, object_path)
+        if features is not None:
+            await run_db(feature_index.forget, db, object_path)
+        existing = await _reference_existing(db, filename, content_type, size_bytes, checksum)
+        if existing is None:
+            raise HTTPException(500, "Could not store deduplicated upload")
+        return existing, True
+
+
+async def _object_path(db: Session, filename: str, features: ImageFeatures | None) -> str:
+    """
+    Images with readable features go to the category folder of similar
+    images; everything else is placed by extension.
+    """
+    if features is None:
+        return get_file_path(filename)
+    return await run_db(feature_index.place, db, features, filename)
+
+
+async def _reference_existing(
+    db: Session,
+    filename: str,
+    content_type: str,
+    size_bytes: int,
+    checksum: str
+) -> models.FileMetadata | None:
+    stored = await run_db(crud.add_object_reference, db, checksum)
+    if stored is None:
+        return None
+
+    metadata = schemas.FileMetadataCreate(
+        original_name=filename,
+        stored_path=stored.object_name,
+        mime_type=content_type,
+        size_bytes=size_bytes,
+        checksum=checksum
+    )
+    return await run_db(crud.save_file_metadata, db, metadata)
+
+
+async def store_upload_batch(
+    db: Session,
+    client: Minio,
+    bucket: str,
+    files: List[UploadFile]
+) -> Tuple[List[Dict[str, Any]], List[models.FileMetadata]]:
+    """
+    Stores many uploaded files: hashes and writes them to MinIO
+    concurrently (at most BATCH_UPLOAD_CONCURRENCY at a time), then
+    inserts all metadata rows in a single transaction.
+    Identical content, within the batch or already stored, is written
+    once. Returns one result per file (in order) and the saved rows.
+    """
+    limiter = asyncio.Semaphore(BATCH_UPLOAD_CONCURRENCY)
+
+    async def bounded(func, *args, **kwargs):
+        async with limiter:
+            return await run_storage(func, *args, **kwargs)
+
+    results: List[Dict[str, Any] | None] = [None] * len(files)
+    content_types = [f.content_type or "application/octet-stream" for f in files]
+    for f in files:
+        f.file.seek(0)
+
+    # 1. Hash everything and look up which content is already stored.
+    hashes: List[Tuple[int, str] | None] = [None] * len(files)
+    known: Dict[str, str] = {}
+    if DEDUP_UPLOADS:
+        hashed = await asyncio.gather(
+            *[bounded(hash_stream, f.file) for f in files], return_exceptions=True
+        )
+        for i, outcome in enumerate(hashed):
+            if isinstance(outcome, Exception):
+                results[i] = _error(files[i], outcome)
+            else:
+                hashes[i] = outcome
+        known = await run_db(
+            crud.get_stored_objects, db, list({h[1] for h in hashes if h})
+        )
+
+    features: List[ImageFeatures | None] = [None] * len(files)
+    images = [i for i, f in enumerate(files) if results[i] is None and is_image(f.filename)]
+    extracted = await asyncio.gather(
+        *[bounded(compute_features, files[i].file) for i in images], return_exceptions=True
+    )
+    for i, outcome in zip(images, extracted):
+        if not isinstance(outcome, Exception):
+            features[i] = outcome
+
+    # 2. Decide per file: reference existing content or upload it.
+    plan: Dict[int, Tuple[str, str]] = {}
+    first_path: Dict[str, str] = {}
+    to_upload: List[int] = []
+
+    for i, f in enumerate(files):
+        if results[i] is not None:
+            continue
+
+        checksum = hashes[i][1] if hashes[i] else None
+        if checksum in known:
+            plan[i] = ("reference", known[checksum])
+        elif checksum in first_path:
+            plan[i] = ("reference", first_path[checksum])
+        else:
+            path = await _object_path(db, f.filename, features[i])
+            plan[i] = ("new_object" if DEDUP_UPLOADS else "plain", path)
+            if checksum:
+                first_path[checksum] = path
+            to_upload.append(i)
+
+    # 3. Write new objects concurrently.
+    uploaded = await asyncio.gather(
+        *[
+            bounded(
+                put_stream, client, bucket, plan[i][1], files[i].file,
+                content_type=content_types[i], hashed=hashes[i]
+            )
+            for i in to_upload
+        ],
+        return_exceptions=True
+    )
+
+    failed_paths = set()
+    for i, outcome in zip(to_upload, uploaded):
+        if isinstance(outcome, Exception):
+            results[i] = _error(files[i], outcome)
+            path = plan.pop(i)[1]
+            failed_paths.add(path)
+            if features[i] is not None:
+                await run_db(feature_index.forget, db, path)
+        else:
+            hashes[i] = outcome
+
+    for i in list(plan):
+        if plan[i][1] in failed_paths:
+            results[i] = _error(files[i], "Upload of identical content failed")
+            del plan[i]
+
+    # 4. All metadata rows in one transaction.
+    order = sorted(plan)
+    entries = [
+        (
+            schemas.FileMetadataCreate(
+                original_name=files[i].filename,
+                stored_path=plan[i][1],
+                mime_type=content_types[i],
+                size_bytes=hashes[i][0],
+                checksum=hashes[i][1]
+            ),
+            plan[i][0]
+        )
+        for i in order
+    ]
+
+    # Only objects written by this batch are ours to remove.
+    created = {i: plan[i][1] for i in to_upload if i in plan}
+
+    try:
+        metas = await run_db(crud.save_file_metadata_batch, db, entries)
+    except Exception as e:
+        db.rollback()
+        for i, path in created.items():
+            await bounded(client.remove_object, bucket, path)
+            if features[i] is not None:
+                await run_db(feature_index.forget, db, path)
+        raise HTTPException(500, f"Error saving batch metadata: {str(e)}")
+
+    for i, meta in zip(order, metas):
+        deduplicated = plan[i][0] == "reference"
+        if i in created and meta.stored_path != created[i]:
+            # A concurrent upload registered the same content first:
+            # the row references their object, so drop our copy.
+            deduplicated = True
+            await bounded(client.remove_object, bucket, created[i])
+            if features[i] is not None:
+                await run_db(feature_index.forget, db, created[i])
+        results[i] = {
+            "filename": files[i].filename,
+            "status": "success",
+            "stored_as": meta.stored_path,
+            "id": meta.id,
+            "deduplicated": deduplicated,
+        }
+
+    return results, metas
+
+
+def _error(f: UploadFile, error: Any) -> Dict[str, Any]:
+    return {"filename": f.filename, "status": "error", "detail": str(error)}
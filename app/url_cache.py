@@ -0,0 +1,75 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable
+
+from .config import (
+    PRESIGNED_URL_EXPIRY_SECONDS,
+    PRESIGNED_URL_REFRESH_MARGIN,
+    PRESIGNED_URL_CACHE_SIZE,
+)
+
+
+class TTLCache:
+    """
+    Bounded LRU cache whose entries expire `ttl` seconds after insertion.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Any | None:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, *keys: Hashable):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+# Keyed by url_key(): one entry per file row and disposition.
+presigned_urls = TTLCache(
+    max_entries=PRESIGNED_URL_CACHE_SIZE,
+    ttl=PRESIGNED_URL_EXPIRY_SECONDS - PRESIGNED_URL_REFRESH_MARGIN,
+)
+
+
+def url_key(meta, disposition: str) -> Hashable:
+    """
+    Cache key of a file's URL for "inline" | "attachment" | "thumb".
+    SQLite hands a deleted file's id to the next insert, and other
+    workers never see forget_file(), so the key also holds the stored
+    object and upload time: a new file reusing the id never matches an
+    entry cached for the old one.
+    """
+    return (meta.id, meta.stored_path, meta.uploaded_at, disposition)
+
+
+def forget_file(meta):
+    presigned_urls.discard(*(url_key(meta, d) for d in ("inline", "attachment", "thumb")))
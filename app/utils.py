@@ -1,6 +1,7 @@
 import os
 import re
 import uuid
+from typing import List, Tuple
 from .file_types import FILE_TYPE_MAP
 
 def sanitize_filename(name: str) -> str:
@@ -13,7 +14,7 @@ def sanitize_filename(name: str) -> str:
     return name
 
 
-def get_file_path(filename: str) -> str:
+def get_file_path(filename: str, subfolder: str | None = None) -> str:
 
     clean = sanitize_filename(filename)
 
@@ -21,6 +22,8 @@ def get_file_path(filename: str) -> str:
     ext = parts[-1].lower() if len(parts) == 2 else ""
 
     folder = FILE_TYPE_MAP.get(ext, "others/")
+    if subfolder:
+        folder = f"{folder}{subfolder}/"
 
     unique = uuid.uuid4().hex[:8]
 
@@ -29,3 +32,27 @@ def get_file_path(filename: str) -> str:
     else:
         return f"{folder}{unique}_file"
 
+
+
+def is_image(filename: str) -> bool:
+    ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    return FILE_TYPE_MAP.get(ext) == "media/images/"
+
+
+def folder_of(stored_path: str) -> str:
+    """
+    "media/images/ab12_cat.png" -> "media/images"
+    """
+    return stored_path.rsplit("/", 1)[0] if "/" in stored_path else ""
+
+
+def folder_chain(folder: str) -> List[Tuple[str, str | None]]:
+    """
+    Returns (path, parent) for the root and every ancestor of `folder`:
+    "media/images" -> [("", None), ("media", ""), ("media/images", "media")]
+    """
+    chain = [("", None)]
+    parts = folder.split("/") if folder else []
+    for i in range(1, len(parts) + 1):
+        chain.append(("/".join(parts[:i]), "/".join(parts[:i - 1])))
+    return chain
@@ -0,0 +1,195 @@
+"""
+In-memory stand-ins for MinIO and MongoDB so the benchmarks run offline.
+They implement only the calls the app makes.
+"""
+import io
+import re
+import threading
+from typing import Any, Dict, List
+from bson import ObjectId
+
+
+class FakeObjectResponse:
+    def __init__(self, data: bytes):
+        self._data = io.BytesIO(data)
+
+    def stream(self, amt: int = 1024 * 1024):
+        while True:
+            chunk = self._data.read(amt)
+            if not chunk:
+                return
+            yield chunk
+
+    def read(self, amt: int | None = None) -> bytes:
+        return self._data.read(amt)
+
+    def close(self):
+        pass
+
+    def release_conn(self):
+        pass
+
+
+class FakeStat:
+    def __init__(self, size: int, content_type: str):
+        self.size = size
+        self.content_type = content_type
+
+
+class FakeMinio:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.buckets = set()
+        self.objects: Dict[str, Dict[str, tuple]] = {}
+
+    def bucket_exists(self, bucket: str) -> bool:
+        return bucket in self.buckets
+
+    def make_bucket(self, bucket: str):
+        self.buckets.add(bucket)
+        self.objects.setdefault(bucket, {})
+
+    def put_object(self, bucket_name, object_name, data, length, part_size=0, content_type="application/octet-stream"):
+        body = data.read() if length == -1 else data.read(length)
+        with self._lock:
+            self.objects.setdefault(bucket_name, {})[object_name] = (body, content_type)
+
+    def get_object(self, bucket_name, object_name):
+        return FakeObjectResponse(self.objects[bucket_name][object_name][0])
+
+    def stat_object(self, bucket_name, object_name):
+        body, content_type = self.objects[bucket_name][object_name]
+        return FakeStat(len(body), content_type)
+
+    def remove_object(self, bucket_name, object_name):
+        with self._lock:
+            self.objects.get(bucket_name, {}).pop(object_name, None)
+
+    def presigned_get_object(self, bucket_name, object_name, expires=None, response_headers=None):
+        return f"http://minio.invalid/{bucket_name}/{object_name}?signature=bench"
+
+    def presigned_put_object(self, bucket_name, object_name, expires=None):
+        return f"http://minio.invalid/{bucket_name}/{object_name}?upload=bench"
+
+
+class FakeInsertResult:
+    def __init__(self, ids: List[ObjectId]):
+        self.inserted_ids = ids
+
+
+class FakeCursor:
+    def __init__(self, docs: List[Dict], projection: Dict | None = None):
+        self._docs = docs
+        self._projection = projection
+
+    def sort(self, key: str, direction: int = 1):
+        self._docs = sorted(self._docs, key=lambda d: d.get(key), reverse=direction < 0)
+        return self
+
+    def limit(self, n: int):
+        self._docs = self._docs[:n]
+        return self
+
+    def batch_size(self, n: int):
+        return self
+
+    def close(self):
+        pass
+
+    def __iter__(self):
+        # Like the server, project after sorting and limiting.
+        if self._projection:
+            return iter([_project(d, self._projection) for d in self._docs])
+        # Hand out copies the caller may modify, as a real driver does.
+        return iter([dict(d) for d in self._docs])
+
+
+class FakeCollection:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.docs: List[Dict] = []
+        self.indexes: Dict[str, Any] = {"_id_": {"key": [("_id", 1)]}}
+
+    def insert_one(self, doc: Dict):
+        doc.setdefault("_id", ObjectId())
+        with self._lock:
+            self.docs.append(doc)
+
+    def insert_many(self, docs: List[Dict], ordered: bool = True):
+        for doc in docs:
+            doc.setdefault("_id", ObjectId())
+        with self._lock:
+            self.docs.extend(docs)
+        return FakeInsertResult([d["_id"] for d in docs])
+
+    def find(self, query: Dict | None = None, projection: Dict | None = None):
+        matched = [d for d in self.docs if _matches(d, query or {})]
+        return FakeCursor(matched, projection)
+
+    def create_index(self, field: str) -> str:
+        name = f"{field}_1"
+        self.indexes[name] = {"key": [(field, 1)]}
+        return name
+
+    def drop_index(self, name: str):
+        self.indexes.pop(name, None)
+
+    def index_information(self) -> Dict[str, Any]:
+        return dict(self.indexes)
+
+
+class FakeDatabase:
+    def __init__(self):
+        self._collections: Dict[str, FakeCollection] = {}
+
+    def __getitem__(self, name: str) -> FakeCollection:
+        return self._collections.setdefault(name, FakeCollection())
+
+    def drop_collection(self, name: str):
+        self._collections.pop(name, None)
+
+
+class FakeMongoClient:
+    def __init__(self):
+        self._databases: Dict[str, FakeDatabase] = {}
+
+    def __getitem__(self, name: str) -> FakeDatabase:
+        return self._databases.setdefault(name, FakeDatabase())
+
+    def close(self):
+        pass
+
+
+_OPS = {
+    "$eq": lambda a, b: a == b,
+    "$gt": lambda a, b: a is not None and a > b,
+    "$gte": lambda a, b: a is not None and a >= b,
+    "$lt": lambda a, b: a is not None and a < b,
+    "$lte": lambda a, b: a is not None and a <= b,
+    "$ne": lambda a, b: a != b,
+    "$in": lambda a, b: a in b,
+    "$regex": lambda a, b: isinstance(a, str) and re.search(b, a) is not None,
+}
+
+
+def _matches(doc: Dict, query: Dict) -> bool:
+    for field, cond in query.items():
+        value = doc.get(field)
+        if isinstance(cond, dict):
+            try:
+                if not all(_OPS[op](value, arg) for op, arg in cond.items()):
+                    return False
+            except TypeError:
+                return False
+        elif value != cond:
+            return False
+    return True
+
+
+def _project(doc: Dict, projection: Dict) -> Dict:
+    if any(v == 0 for v in projection.values()):
+        return {k: v for k, v in doc.items() if projection.get(k, 1) != 0}
+    out = {k: doc[k] for k in projection if k in doc}
+    if "_id" not in projection:
+        out["_id"] = doc["_id"]
+    return out
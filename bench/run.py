@@ -0,0 +1,450 @@
+"""
+Offline performance benchmarks for the storage API.
+
+Drives the FastAPI app in-process (no server, no network) against a temp
+SQLite database, an in-memory MinIO and an in-memory MongoDB, and prints
+one JSON report: per scenario latency percentiles, throughput and
+memory. Run from the repository root:
+
+    python -m bench.run --scale small --output bench.json
+
+Compare reports across versions with the same --scale and --seed.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import string
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from typing import Any, Callable, Dict, List, Tuple
+from urllib.parse import urlencode
+
+SCALES = {
+    # files uploaded, JSON datasets, rows per dataset, reads per read scenario
+    "small": {"files": 200, "datasets": 4, "rows": 2_000, "reads": 200},
+    "medium": {"files": 2_000, "datasets": 8, "rows": 20_000, "reads": 1_000},
+    "large": {"files": 10_000, "datasets": 16, "rows": 200_000, "reads": 2_000},
+}
+
+FILE_KINDS = [
+    ("txt", "text/plain"),
+    ("pdf", "application/pdf"),
+    ("png", "image/png"),
+    ("mp3", "audio/mpeg"),
+    ("csv", "text/csv"),
+]
+
+WORDS = ["report", "invoice", "holiday", "summary", "draft", "photo", "budget", "notes", "scan", "backup"]
+
+
+class AsgiClient:
+    """
+    Minimal in-process HTTP client: calls the ASGI app directly.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def request(self, method: str, path: str, body: bytes = b"", headers: Dict[str, str] | None = None):
+        path, _, query = path.partition("?")
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]
+            + [(b"content-length", str(len(body)).encode()), (b"host", b"bench")],
+            "client": ("127.0.0.1", 0),
+            "server": ("bench", 80),
+        }
+        sent = False
+        finished = asyncio.Event()
+
+        async def receive():
+            nonlocal sent
+            if sent:
+                # Like a real client, only disconnect once the response is
+                # complete; streaming responses watch for this.
+                await finished.wait()
+                return {"type": "http.disconnect"}
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        status = 0
+        chunks: List[bytes] = []
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    finished.set()
+
+        await self.app(scope, receive, send)
+        return status, b"".join(chunks)
+
+    async def get(self, path: str):
+        return await self.request("GET", path)
+
+    async def post_json(self, path: str, payload: Any):
+        return await self.request(
+            "POST", path, json.dumps(payload).encode(), {"content-type": "application/json"}
+        )
+
+    async def post_file(self, path: str, filename: str, content: bytes, content_type: str):
+        boundary = uuid.uuid4().hex
+        body = (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n"
+        ).encode() + content + f"\r\n--{boundary}--\r\n".encode()
+        return await self.request(
+            "POST", path, body, {"content-type": f"multipart/form-data; boundary={boundary}"}
+        )
+
+
+class Recorder:
+    """
+    Collects per-operation latencies and memory for one scenario.
+    """
+
+    def __init__(self, name: str, trace_memory: bool, worker_pids: Callable[[], List[int]] | None = None):
+        self.name = name
+        self.trace_memory = trace_memory
+        # Processes doing the scenario's work outside this one.
+        self.worker_pids = worker_pids
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.units = 0
+        self.unit_name: str | None = None
+
+    async def measure(self, call: Callable, ok: Callable[[int], bool] = lambda s: s < 400):
+        started = time.perf_counter()
+        status, body = await call()
+        self.latencies.append(time.perf_counter() - started)
+        if not ok(status):
+            self.errors += 1
+        return status, body
+
+    def __enter__(self):
+        if self.trace_memory:
+            tracemalloc.start()
+        self._rss_before = _max_rss_bytes()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self._started
+        self.rss_after = _max_rss_bytes()
+        self.workers_rss = _peak_rss_of(self.worker_pids()) if self.worker_pids else None
+        self.peak_traced = None
+        if self.trace_memory:
+            self.peak_traced = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    def report(self) -> Dict[str, Any]:
+        lat = sorted(self.latencies)
+        out = {
+            "operations": len(lat),
+            "errors": self.errors,
+            "seconds": round(self.seconds, 4),
+            "ops_per_sec": round(len(lat) / self.seconds, 2) if self.seconds else None,
+            "latency_ms": {
+                "mean": _ms(sum(lat) / len(lat)) if lat else None,
+                "p50": _ms(_percentile(lat, 50)),
+                "p90": _ms(_percentile(lat, 90)),
+                "p99": _ms(_percentile(lat, 99)),
+                "max": _ms(lat[-1]) if lat else None,
+            },
+            # ru_maxrss is a high-water mark for the whole run, so the
+            # scenario's own cost is how far it raised it (0 if it stayed
+            # below an earlier scenario's peak).
+            "process_peak_rss_mb": round(self.rss_after / 2**20, 1),
+            "peak_rss_growth_mb": round((self.rss_after - self._rss_before) / 2**20, 1),
+        }
+        if self.worker_pids:
+            out["workers_peak_rss_mb"] = None if self.workers_rss is None else round(self.workers_rss / 2**20, 1)
+        if self.unit_name:
+            out[f"{self.unit_name}_per_sec"] = round(self.units / self.seconds, 1) if self.seconds else None
+        if self.peak_traced is not None:
+            out["peak_traced_mb"] = round(self.peak_traced / 2**20, 2)
+        return out
+
+
+def _percentile(values: List[float], pct: float) -> float | None:
+    if not values:
+        return None
+    k = (len(values) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def _ms(seconds: float | None) -> float | None:
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+def _max_rss_bytes() -> int:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def _peak_rss_of(pids: List[int]) -> int | None:
+    """
+    Sum of the peak RSS (VmHWM) of live processes; None where /proc is
+    unavailable. RUSAGE_CHILDREN can't be used: it only covers children
+    that have exited, and the ingestion workers stay up.
+    """
+    total = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                total += next(int(line.split()[1]) * 1024 for line in f if line.startswith("VmHWM:"))
+        except (OSError, StopIteration):
+            return None
+    return total
+
+
+def _ingest_worker_pids() -> List[int]:
+    from app.jobs import ingest_jobs
+    pool = ingest_jobs._pool
+    return list(pool._processes) if pool is not None else []
+
+
+# ---- synthetic data ----
+
+def make_file(rng: random.Random, max_kb: int) -> Tuple[str, bytes, str]:
+    ext, content_type = rng.choice(FILE_KINDS)
+    name = f"{rng.choice(WORDS)}_{rng.choice(WORDS)}_{rng.randrange(10**6)}.{ext}"
+    size = rng.randint(256, max_kb * 1024)
+    return name, rng.randbytes(size), content_type
+
+
+def make_rows(rng: random.Random, count: int, sql_like: bool) -> List[Dict[str, Any]]:
+    rows = []
+    for i in range(count):
+        row = {
+            "id": i,
+            "user": "".join(rng.choices(string.ascii_lowercase, k=8)),
+            "score": round(rng.random() * 100, 3),
+            "active": rng.random() < 0.5,
+            "city": rng.choice(WORDS),
+        }
+        if not sql_like:
+            row["tags"] = rng.sample(WORDS, 3)
+            row["profile"] = {"age": rng.randint(18, 90), "level": rng.randint(1, 5)}
+        rows.append(row)
+    return rows
+
+
+# ---- scenarios ----
+
+async def bench_upload(client, rng, cfg, trace) -> Recorder:
+    rec = Recorder("upload", trace)
+    rec.unit_name, total_bytes = "mb", 0
+    with rec:
+        for _ in range(cfg["files"]):
+            name, data, content_type = make_file(rng, cfg["max_file_kb"])
+            total_bytes += len(data)
+            await rec.measure(lambda: client.post_file("/upload", name, data, content_type))
+        rec.units = total_bytes / 2**20
+    return rec
+
+
+async def bench_files_tree(client, cfg, trace) -> Recorder:
+    rec = Recorder("files_tree", trace)
+    with rec:
+        for _ in range(cfg["reads"]):
+            await rec.measure(lambda: client.get("/files/tree"))
+    return rec
+
+
+async def bench_search(client, rng, cfg, trace) -> Recorder:
+    rec = Recorder("search", trace)
+    with rec:
+        for _ in range(cfg["reads"]):
+            term = rng.choice(WORDS)[:rng.randint(2, 6)]
+            await rec.measure(lambda: client.get("/search?" + urlencode({"query": term, "limit": 50})))
+    return rec
+
+
+async def bench_json_ingest(client, rng, cfg, trace) -> Tuple[Recorder, List[int]]:
+    """
+    Submits SQL-like datasets through /json/upload and waits for each job;
+    latency is submit-to-done.
+    """
+    rec = Recorder("json_ingest_sql", trace, worker_pids=_ingest_worker_pids)
+    rec.unit_name = "rows"
+    dataset_ids = []
+
+    async def ingest(rows):
+        status, body = await client.post_json("/json/upload", rows)
+        if status >= 400:
+            return status, body
+        job_id = json.loads(body)["job_id"]
+        while True:
+            status, body = await client.get(f"/jobs/{job_id}")
+            job = json.loads(body)
+            if job["status"] in ("done", "failed"):
+                if job["dataset_id"] is not None:
+                    dataset_ids.append(job["dataset_id"])
+                return (200 if job["status"] == "done" else 500), body
+            await asyncio.sleep(0.01)
+
+    # Start the worker processes outside the timed section.
+    await ingest(make_rows(rng, 1, sql_like=True))
+    dataset_ids.clear()
+
+    with rec:
+        for _ in range(cfg["datasets"]):
+            rows = make_rows(rng, cfg["rows"], sql_like=True)
+            await rec.measure(lambda: ingest(rows))
+            rec.units += len(rows)
+    return rec, dataset_ids
+
+
+async def bench_nosql_ingest(rng, cfg, trace) -> Tuple[Recorder, List[int]]:
+    """
+    Ingests nested (NoSQL) datasets in-process: worker processes cannot
+    see the in-memory Mongo stand-in.
+    """
+    from app.concurrency import run_db
+    from app.db.database import SessionLocal
+    from app.json_ingestion.manager import ingest_json
+
+    rec = Recorder("json_ingest_nosql", trace)
+    rec.unit_name = "rows"
+    dataset_ids = []
+
+    def ingest(rows):
+        with SessionLocal() as db:
+            result = ingest_json(db, rows, original_name="bench_nested.json")
+        dataset_ids.append(result["dataset_id"])
+        return 200, b""
+
+    with rec:
+        for _ in range(max(1, cfg["datasets"] // 2)):
+            rows = make_rows(rng, cfg["rows"], sql_like=False)
+            await rec.measure(lambda: run_db(ingest, rows))
+            rec.units += len(rows)
+    return rec, dataset_ids
+
+
+async def bench_json_retrieve(client, rng, name, dataset_ids, cfg, trace) -> Recorder:
+    """
+    Keyset pages, projections and filtered reads against random datasets.
+    """
+    rec = Recorder(name, trace)
+    queries = [
+        {"limit": 100},
+        {"limit": 100, "fields": "id,user"},
+        {"limit": 100, "filter": "score:gte:50"},
+        {"limit": 100, "filter": "city:eq:report"},
+    ]
+    with rec:
+        for _ in range(cfg["reads"]):
+            params = dict(rng.choice(queries))
+            dataset_id = rng.choice(dataset_ids)
+            await rec.measure(lambda: client.get(f"/json/{dataset_id}?" + urlencode(params)))
+    return rec
+
+
+async def run_benchmarks(cfg: Dict[str, Any], trace: bool) -> Dict[str, Any]:
+    from bench.fakes import FakeMinio, FakeMongoClient
+    from app import storage
+    from app.json_ingestion import mongo
+
+    storage._client = FakeMinio()
+    mongo._client = FakeMongoClient()
+
+    import app.main as main
+
+    rng = random.Random(cfg["seed"])
+    client = AsgiClient(main.app)
+    scenarios: Dict[str, Any] = {}
+
+    async with main.app.router.lifespan_context(main.app):
+        rec = await bench_upload(client, rng, cfg, trace)
+        scenarios[rec.name] = rec.report()
+
+        rec = await bench_files_tree(client, cfg, trace)
+        scenarios[rec.name] = rec.report()
+
+        rec = await bench_search(client, rng, cfg, trace)
+        scenarios[rec.name] = rec.report()
+
+        rec, sql_ids = await bench_json_ingest(client, rng, cfg, trace)
+        scenarios[rec.name] = rec.report()
+
+        rec, nosql_ids = await bench_nosql_ingest(rng, cfg, trace)
+        scenarios[rec.name] = rec.report()
+
+        if sql_ids:
+            rec = await bench_json_retrieve(client, rng, "json_retrieve_sql", sql_ids, cfg, trace)
+            scenarios[rec.name] = rec.report()
+        if nosql_ids:
+            rec = await bench_json_retrieve(client, rng, "json_retrieve_nosql", nosql_ids, cfg, trace)
+            scenarios[rec.name] = rec.report()
+
+    return {
+        "config": cfg,
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "trace_memory": trace,
+        },
+        "startup": dict(main.startup_timings),
+        "scenarios": scenarios,
+    }
+
+
+def main(argv: List[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--files", type=int, help="files to upload (overrides --scale)")
+    parser.add_argument("--datasets", type=int, help="SQL datasets to ingest (overrides --scale)")
+    parser.add_argument("--rows", type=int, help="rows per dataset (overrides --scale)")
+    parser.add_argument("--reads", type=int, help="requests per read scenario (overrides --scale)")
+    parser.add_argument("--max-file-kb", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="record peak Python allocations per scenario (slower)")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    cfg = dict(SCALES[args.scale], scale=args.scale, max_file_kb=args.max_file_kb, seed=args.seed)
+    for key in ("files", "datasets", "rows", "reads"):
+        if getattr(args, key) is not None:
+            cfg[key] = getattr(args, key)
+
+    with tempfile.TemporaryDirectory(prefix="bench_") as tmp:
+        # Must be set before the app is imported; ingestion worker
+        # processes inherit it.
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        report = asyncio.run(run_benchmarks(cfg, args.trace_memory))
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
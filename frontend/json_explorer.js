@@ -54,17 +54,7 @@ async function loadDatasets(query = null) {
   `;
 
   try {
-    let url = `${API_BASE}/json/datasets`;
-    if (query) {
-      url += `?query=${encodeURIComponent(query)}`;
-    }
-
-    const res = await fetch(url);
-    if (!res.ok) {
-      throw new Error(`Failed to load datasets: ${res.status}`);
-    }
-
-    const datasets = await res.json();
+    const datasets = await fetchAllDatasets(query);
     renderDatasetTable(datasets, query);
 
   } catch (err) {
@@ -79,6 +69,35 @@ async function loadDatasets(query = null) {
   }
 }
 
+// --------------------------------------------------
+// FETCH EVERY PAGE OF /json/datasets
+// (follows the X-Next-Before-Id cursor header)
+// --------------------------------------------------
+async function fetchAllDatasets(query = null) {
+  const datasets = [];
+  let beforeId = null;
+
+  do {
+    const params = new URLSearchParams({ limit: "1000" });
+    if (query) {
+      params.set("query", query);
+    }
+    if (beforeId) {
+      params.set("before_id", beforeId);
+    }
+
+    const res = await fetch(`${API_BASE}/json/datasets?${params}`);
+    if (!res.ok) {
+      throw new Error(`Failed to load datasets: ${res.status}`);
+    }
+
+    datasets.push(...(await res.json()));
+    beforeId = res.headers.get("X-Next-Before-Id");
+  } while (beforeId);
+
+  return datasets;
+}
+
 // --------------------------------------------------
 // RENDER TABLE ROWS
 // --------------------------------------------------
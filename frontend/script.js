@@ -101,6 +101,18 @@ async function handleUpload() {
 
     const data = await res.json();
 
+    // JSON files are ingested as datasets by a background job.
+    if (data.job_id) {
+      uploadBtnText.textContent = "Ingesting...";
+      const job = await pollJob(data);
+      if (job.status === "failed") {
+        showToast("Ingestion failed", job.error || "JSON could not be stored.");
+      } else {
+        showToast("JSON Stored", `${selectedFile.name} stored as dataset ${job.dataset_id}.`);
+      }
+      return;
+    }
+
     uploadedFileName.textContent = data.stored_as;
 
     const viewRes = await fetch(`http://localhost:8000/view/${data.id}`);
@@ -190,11 +202,20 @@ uploadJsonBtn.addEventListener("click", async () => {
       body: raw
     });
 
-    const data = await res.json();
+    let data = await res.json();
 
     jsonResult.style.display = "block";
     jsonResultContent.textContent = JSON.stringify(data, null, 2);
 
+    data = await pollJob(data, job => {
+      jsonResultContent.textContent = JSON.stringify(job, null, 2);
+    });
+
+    if (data.status === "failed") {
+      showToast("Ingestion failed", data.error || "JSON could not be stored.");
+      return;
+    }
+
     showToast("JSON Stored", "JSON successfully processed.");
   } catch (err) {
     console.error(err);
@@ -203,6 +224,20 @@ uploadJsonBtn.addEventListener("click", async () => {
 });
 
 
+// --------------------------------------------------------------
+// Ingestion jobs: poll /jobs/{id} until the job is done or failed
+// --------------------------------------------------------------
+async function pollJob(job, onUpdate = () => {}) {
+  while (job.status === "queued" || job.status === "running") {
+    await new Promise(resolve => setTimeout(resolve, 1000));
+    const jobRes = await fetch(`http://localhost:8000/jobs/${job.job_id || job.id}`);
+    job = await jobRes.json();
+    onUpdate(job);
+  }
+  return job;
+}
+
+
 // --------------------------------------------------------------
 // Toast Notifications
 // --------------------------------------------------------------
@@ -0,0 +1,73 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import inspect, text
+
+from app.db import models
+from app.db.database import SessionLocal, engine
+from app.json_ingestion.manager import ingest_json
+from app.main import prepare_database
+
+THREADS = 8
+INGESTS_PER_THREAD = 5
+ROWS = 200
+
+
+def _rows(worker: int, n: int):
+    return [
+        {"worker": worker, "n": n, "i": i, "label": f"w{worker}-{i}", "score": i / 7}
+        for i in range(ROWS)
+    ]
+
+
+def test_concurrent_ingests_get_distinct_datasets():
+    prepare_database()
+    start = threading.Barrier(THREADS)
+
+    def worker(w: int):
+        start.wait()
+        results = []
+        for n in range(INGESTS_PER_THREAD):
+            # One session per ingest, as in jobs._run_job.
+            with SessionLocal() as db:
+                results.append((w, n, ingest_json(db, _rows(w, n), original_name=f"w{w}_{n}.json")))
+        return results
+
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        results = [r for rs in pool.map(worker, range(THREADS)) for r in rs]
+
+    total = THREADS * INGESTS_PER_THREAD
+    assert len(results) == total
+    assert all(r["storage_type"] == "sql" and r["rows"] == ROWS for _, _, r in results)
+
+    dataset_ids = [r["dataset_id"] for _, _, r in results]
+    assert len(set(dataset_ids)) == total
+
+    with SessionLocal() as db:
+        metas = (
+            db.query(models.JsonDataset)
+            .filter(models.JsonDataset.id.in_(dataset_ids))
+            .all()
+        )
+        pending = (
+            db.query(models.JsonDataset)
+            .filter(models.JsonDataset.storage_type == models.PENDING_DATASET)
+            .count()
+        )
+
+    assert pending == 0
+    table_names = [m.sql_table_name for m in metas]
+    assert len(metas) == total
+    assert len(set(table_names)) == total
+    assert set(table_names) <= set(inspect(engine).get_table_names())
+
+    # Each table holds exactly the rows of the ingest that named it.
+    by_id = {r["dataset_id"]: (w, n) for w, n, r in results}
+    with engine.connect() as conn:
+        for meta in metas:
+            w, n = by_id[meta.id]
+            owners = conn.execute(
+                text(f'SELECT DISTINCT worker, n FROM "{meta.sql_table_name}"')
+            ).all()
+            assert owners == [(w, n)]
+            assert meta.original_name == f"w{w}_{n}.json"
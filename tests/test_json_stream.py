@@ -0,0 +1,49 @@
+import io
+import json
+
+import pytest
+
+from app.json_ingestion.stream import JsonStreamReader
+
+VALUES = [
+    1.5e-3, -2, 10.25, 0, -0.5, 12345678901234, 2.5E+10, True, False, None,
+    "a \"quoted\" \u00e9 string", {"n": -1.0e-7, "t": [1, "x", {"y": None}]}, [],
+]
+
+
+def _read(data: bytes, chunk_size: int):
+    kind, values = JsonStreamReader(io.BytesIO(data), chunk_size=chunk_size).open()
+    return kind, list(values)
+
+
+@pytest.mark.parametrize("chunk_size", range(1, 24))
+def test_array_split_at_every_offset(chunk_size):
+    data = json.dumps(VALUES).encode()
+    assert _read(data, chunk_size) == ("array", VALUES)
+
+
+@pytest.mark.parametrize("chunk_size", range(1, 24))
+def test_ndjson_split_at_every_offset(chunk_size):
+    data = "\n".join(json.dumps(v, ensure_ascii=False) for v in VALUES).encode()
+    assert _read(data, chunk_size) == ("values", VALUES)
+
+
+def test_number_cut_after_exponent_marker():
+    assert _read(b"[1.5e-3]", 5) == ("array", [1.5e-3])
+    assert _read(b"[1.5e-3]", 4) == ("array", [1.5e-3])
+
+
+def test_malformed_element_fails_without_reading_ahead():
+    data = b'[{"a": 1}, {"a": tru}, ' + b", ".join([b'{"x": "' + b"y" * 100 + b'"}'] * 5000) + b"]"
+    reader = JsonStreamReader(io.BytesIO(data), chunk_size=4096)
+    _, values = reader.open()
+    with pytest.raises(ValueError):
+        list(values)
+    assert len(reader._buf) <= 2 * 4096
+
+
+def test_oversized_element_is_rejected():
+    data = b'["' + b"z" * 5000 + b'"]'
+    _, values = JsonStreamReader(io.BytesIO(data), chunk_size=100, max_element_size=1000).open()
+    with pytest.raises(ValueError, match="exceeds"):
+        list(values)
@@ -0,0 +1,56 @@
+import json
+import os
+import subprocess
+import sys
+
+from app.config import STARTUP_BUDGET_SECONDS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Run in a fresh interpreter so nothing is already imported. Every
+# socket connect / DNS lookup made while importing app.main is recorded
+# and refused.
+IMPORT_SCRIPT = """
+import json, socket, time
+
+attempts = []
+
+def refuse(kind):
+    def call(*args, **kwargs):
+        attempts.append([kind, repr(args[:2])])
+        raise OSError("network access during import")
+    return call
+
+socket.socket.connect = refuse("connect")
+socket.socket.connect_ex = refuse("connect_ex")
+socket.getaddrinfo = refuse("getaddrinfo")
+socket.create_connection = refuse("create_connection")
+
+started = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - started
+
+print(json.dumps({"seconds": elapsed, "network": attempts}))
+"""
+
+
+def _import_app():
+    env = dict(os.environ)
+    # Unreachable endpoints: an eager client would hang or fail here.
+    env.setdefault("MINIO_ENDPOINT", "minio.invalid:9000")
+    env.setdefault("MONGO_URI", "mongodb://mongo.invalid:27017")
+    out = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=60, check=True
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def test_import_stays_under_startup_budget():
+    result = _import_app()
+    assert result["seconds"] < STARTUP_BUDGET_SECONDS, result
+
+
+def test_import_makes_no_network_calls():
+    result = _import_app()
+    assert result["network"] == []